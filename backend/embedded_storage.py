@@ -0,0 +1,367 @@
+from bisect import bisect_right, insort
+from copy import deepcopy
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from bson import BSON
+import json
+import sqlite3
+
+from storage import TravelListRepository
+
+
+def _key(*parts) -> str:
+    return json.dumps(parts)
+
+
+class EmbeddedRepository(TravelListRepository):
+    """In-process storage engine for single-node deployments and tests.
+
+    Everything lives in dicts: lists by owner and list id, and each list's
+    items by item id, so item updates and deletes never scan the array.
+    Operations do not await, so each one is atomic on the event loop.
+
+    With `sqlite_path`, every change is also written through to a SQLite
+    file (one BSON blob per document) that is loaded back on start.
+    """
+
+    def __init__(self, sqlite_path: Optional[str] = None):
+        self.categories: List[dict] = []
+        # owner_id -> list_id -> list document whose "items" is {item_id: item}
+        self.lists: Dict[str, Dict[str, dict]] = {}
+        # (owner_id, list_id) -> events ordered by seq
+        self.events: Dict[Tuple[str, str], List[dict]] = {}
+        self.archived: Dict[Tuple[str, str], dict] = {}
+        self.analytics: Dict[str, dict] = {}
+        self.jobs: Dict[str, dict] = {}
+        self.sqlite = None
+        if sqlite_path:
+            # Only the event loop thread touches the connection, but it may not be
+            # the thread that imported the app
+            self.sqlite = sqlite3.connect(sqlite_path, isolation_level=None, check_same_thread=False)
+            self.sqlite.execute("PRAGMA journal_mode=WAL")
+            self.sqlite.execute("PRAGMA synchronous=NORMAL")
+            self.sqlite.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "kind TEXT NOT NULL, key TEXT NOT NULL, data BLOB NOT NULL, PRIMARY KEY (kind, key))"
+            )
+            self._load()
+
+    def close(self):
+        if self.sqlite:
+            self.sqlite.close()
+            self.sqlite = None
+
+    # Persistence
+    def _save(self, kind: str, key: str, document: dict):
+        if self.sqlite:
+            self.sqlite.execute(
+                "INSERT OR REPLACE INTO documents (kind, key, data) VALUES (?, ?, ?)",
+                (kind, key, BSON.encode(document)),
+            )
+
+    def _remove(self, kind: str, keys: List[str]):
+        if self.sqlite and keys:
+            self.sqlite.executemany(
+                "DELETE FROM documents WHERE kind = ? AND key = ?", [(kind, key) for key in keys]
+            )
+
+    def _load(self):
+        rows = self.sqlite.execute("SELECT kind, data FROM documents ORDER BY kind, key")
+        for kind, data in rows:
+            document = BSON(data).decode()
+            if kind == "category":
+                self.categories.append(document)
+            elif kind == "list":
+                self._put_list(document)
+            elif kind == "event":
+                events = self.events.setdefault((document["owner_id"], document["list_id"]), [])
+                insort(events, document, key=lambda event: event["seq"])
+            elif kind == "archived":
+                self.archived[(document["owner_id"], document["id"])] = document
+            elif kind == "analytics":
+                self.analytics[document["owner_id"]] = document
+            elif kind == "job":
+                self.jobs[document["id"]] = document
+
+    # Travel list documents keep items keyed by id internally
+    def _put_list(self, travel_list: dict):
+        stored = deepcopy(travel_list)
+        stored["items"] = {item["id"]: item for item in stored.get("items", [])}
+        self.lists.setdefault(stored["owner_id"], {})[stored["id"]] = stored
+        return stored
+
+    def _export_list(self, stored: dict) -> dict:
+        travel_list = deepcopy(stored)
+        travel_list["items"] = list(travel_list["items"].values())
+        return travel_list
+
+    def _save_list(self, stored: dict):
+        if self.sqlite:
+            self._save("list", _key(stored["owner_id"], stored["id"]), self._export_list(stored))
+
+    def _stored_list(self, owner_id: str, list_id: str) -> Optional[dict]:
+        return self.lists.get(owner_id, {}).get(list_id)
+
+    # Categories
+    async def list_categories(self):
+        return deepcopy(self.categories)
+
+    async def insert_categories(self, categories):
+        for category in categories:
+            self.categories.append(deepcopy(category))
+            self._save("category", _key(category["id"]), category)
+
+    # Travel lists
+    async def list_travel_lists(self, owner_id, limit=1000):
+        stored_lists = list(self.lists.get(owner_id, {}).values())[:limit]
+        return [self._export_list(stored) for stored in stored_lists]
+
+    async def get_travel_list(self, owner_id, list_id):
+        stored = self._stored_list(owner_id, list_id)
+        return self._export_list(stored) if stored else None
+
+    async def insert_travel_list(self, travel_list):
+        if self._stored_list(travel_list["owner_id"], travel_list["id"]):
+            raise ValueError(f"Duplicate travel list id: {travel_list['id']}")
+        self._save_list(self._put_list(travel_list))
+
+    async def replace_travel_list(self, travel_list):
+        self._save_list(self._put_list(travel_list))
+
+    async def update_travel_list(self, owner_id, list_id, fields):
+        stored = self._stored_list(owner_id, list_id)
+        if not stored:
+            return False
+        stored.update(deepcopy(fields))
+        self._save_list(stored)
+        return True
+
+    async def delete_travel_list(self, owner_id, list_id, where=None):
+        stored = self._stored_list(owner_id, list_id)
+        if not stored or any(stored.get(k) != v for k, v in (where or {}).items()):
+            return False
+        del self.lists[owner_id][list_id]
+        self._remove("list", [_key(owner_id, list_id)])
+        return True
+
+    async def count_travel_lists(self, owner_id):
+        return len(self.lists.get(owner_id, {}))
+
+    async def list_travel_list_ids(self, owner_id, list_ids=None):
+        owned = self.lists.get(owner_id, {})
+        if list_ids is None:
+            return list(owned)
+        return [list_id for list_id in list_ids if list_id in owned]
+
+    async def iter_travel_lists(self, owner_id, batch_size):
+        list_ids = list(self.lists.get(owner_id, {}))
+        for start in range(0, len(list_ids), batch_size):
+            batch = [self._stored_list(owner_id, list_id) for list_id in list_ids[start:start + batch_size]]
+            yield [self._export_list(stored) for stored in batch if stored]
+
+    async def find_stale_lists(self, before, owner_id=None):
+        return [
+            {"owner_id": list_owner, "id": list_id}
+            for list_owner, owned in self.lists.items()
+            if owner_id is None or list_owner == owner_id
+            for list_id, stored in owned.items()
+            if stored.get("updated_at") and stored["updated_at"] < before
+        ]
+
+    async def bulk_update_travel_lists(self, owner_id, list_ids, fields, item_fields):
+        modified = 0
+        for list_id in list_ids:
+            stored = self._stored_list(owner_id, list_id)
+            if not stored:
+                continue
+            stored.update(deepcopy(fields))
+            for item in stored["items"].values():
+                item.update(deepcopy(item_fields))
+            self._save_list(stored)
+            modified += 1
+        return modified
+
+    # Items
+    async def push_item(self, owner_id, list_id, item):
+        stored = self._stored_list(owner_id, list_id)
+        if not stored:
+            return False
+        stored["items"][item["id"]] = deepcopy(item)
+        stored["updated_at"] = datetime.utcnow()
+        self._save_list(stored)
+        return True
+
+    async def update_item(self, owner_id, list_id, item_id, fields):
+        stored = self._stored_list(owner_id, list_id)
+        item = stored["items"].get(item_id) if stored else None
+        if not item:
+            return None
+        item.update(deepcopy(fields))
+        stored["updated_at"] = datetime.utcnow()
+        self._save_list(stored)
+        return deepcopy(item)
+
+    async def pull_item(self, owner_id, list_id, item_id):
+        stored = self._stored_list(owner_id, list_id)
+        if not stored:
+            return False
+        stored["items"].pop(item_id, None)
+        stored["updated_at"] = datetime.utcnow()
+        self._save_list(stored)
+        return True
+
+    # Item event log
+    async def next_event_seq(self, owner_id, list_id, now):
+        stored = self._stored_list(owner_id, list_id)
+        if not stored:
+            return None
+        stored["event_seq"] = stored.get("event_seq", 0) + 1
+        stored["updated_at"] = now
+        self._save_list(stored)
+        return stored["event_seq"]
+
+    async def set_items_snapshot(self, owner_id, list_id, expected_seq, items, snapshot_seq):
+        stored = self._stored_list(owner_id, list_id)
+        if not stored or stored.get("snapshot_seq") != expected_seq:
+            return False
+        stored["items"] = {item["id"]: item for item in deepcopy(items)}
+        stored["snapshot_seq"] = snapshot_seq
+        self._save_list(stored)
+        return True
+
+    async def insert_event(self, event):
+        key = (event["owner_id"], event["list_id"])
+        insort(self.events.setdefault(key, []), deepcopy(event), key=lambda stored: stored["seq"])
+        self._save("event", _key(*key, event["seq"]), event)
+
+    async def find_events_after(self, cursors):
+        found = []
+        for owner_id, list_id, seq in cursors:
+            events = self.events.get((owner_id, list_id), [])
+            found.extend(events[bisect_right(events, seq, key=lambda event: event["seq"]):])
+        found.sort(key=lambda event: event["seq"])
+        return deepcopy(found)
+
+    async def get_list_item(self, owner_id, list_id, item_id):
+        stored = self._stored_list(owner_id, list_id)
+        if not stored:
+            return None
+        return {"snapshot_seq": stored.get("snapshot_seq"), "item": deepcopy(stored["items"].get(item_id))}
+
+    async def find_item_events_after(self, owner_id, list_id, item_id, seq):
+        events = self.events.get((owner_id, list_id), [])
+        start = bisect_right(events, seq, key=lambda event: event["seq"])
+        return deepcopy([event for event in events[start:] if event["item_id"] == item_id])
+
+    async def mark_events_folded(self, owner_id, list_id, up_to_seq):
+        for event in self.events.get((owner_id, list_id), []):
+            if event["seq"] > up_to_seq:
+                break
+            if not event["folded"]:
+                event["folded"] = True
+                self._save("event", _key(owner_id, list_id, event["seq"]), event)
+
+    async def event_history(self, owner_id, list_id, item_id, limit):
+        history = []
+        for event in reversed(self.events.get((owner_id, list_id), [])):
+            if item_id and event["item_id"] != item_id:
+                continue
+            history.append({k: v for k, v in event.items() if k != "folded"})
+            if len(history) >= limit:
+                break
+        return deepcopy(history)
+
+    async def event_backlog(self, min_count, owner_id=None):
+        return [
+            key for key, events in self.events.items()
+            if (owner_id is None or key[0] == owner_id)
+            and sum(1 for event in events if not event["folded"]) > min_count
+        ]
+
+    async def delete_folded_events(self, before, owner_id=None):
+        deleted = 0
+        for key, events in self.events.items():
+            if owner_id is not None and key[0] != owner_id:
+                continue
+            expired = [event for event in events if event["folded"] and event["created_at"] < before]
+            if not expired:
+                continue
+            self.events[key] = [event for event in events if not (event["folded"] and event["created_at"] < before)]
+            self._remove("event", [_key(*key, event["seq"]) for event in expired])
+            deleted += len(expired)
+        return deleted
+
+    # Archived lists
+    async def put_archived(self, record):
+        self.archived[(record["owner_id"], record["id"])] = deepcopy(record)
+        self._save("archived", _key(record["owner_id"], record["id"]), record)
+
+    async def get_archived(self, owner_id, list_id):
+        return deepcopy(self.archived.get((owner_id, list_id)))
+
+    async def delete_archived(self, owner_id, list_id):
+        if self.archived.pop((owner_id, list_id), None):
+            self._remove("archived", [_key(owner_id, list_id)])
+
+    async def list_archived(self, owner_id):
+        return [
+            {k: v for k, v in record.items() if k != "data"}
+            for (record_owner, _), record in self.archived.items()
+            if record_owner == owner_id
+        ]
+
+    # Analytics
+    async def get_analytics(self, owner_id):
+        return deepcopy(self.analytics.get(owner_id))
+
+    async def put_analytics(self, owner_id, summary):
+        self.analytics[owner_id] = {"owner_id": owner_id, **deepcopy(summary)}
+        self._save("analytics", _key(owner_id), self.analytics[owner_id])
+
+    # Jobs
+    async def insert_job(self, job):
+        self.jobs[job["id"]] = deepcopy(job)
+        self._save("job", _key(job["id"]), job)
+
+    async def get_job(self, job_id, owner_id=None):
+        job = self.jobs.get(job_id)
+        if not job or (owner_id is not None and job.get("owner_id") != owner_id):
+            return None
+        return deepcopy(job)
+
+    async def claim_job(self, names, now, fields):
+        runnable = [
+            job for job in self.jobs.values()
+            if job["name"] in names and (
+                (job["status"] == "queued" and job["run_after"] <= now)
+                or (job["status"] == "running" and job.get("lease_expires_at", now) < now
+                    and job["attempts"] < job["max_attempts"])
+            )
+        ]
+        if not runnable:
+            return None
+        job = min(runnable, key=lambda job: job["run_after"])
+        job.update(deepcopy(fields))
+        job["attempts"] = job.get("attempts", 0) + 1
+        self._save("job", _key(job["id"]), job)
+        return deepcopy(job)
+
+    async def fail_abandoned_jobs(self, now, fields):
+        abandoned = [
+            job for job in self.jobs.values()
+            if job["status"] == "running" and job.get("lease_expires_at", now) < now
+            and job["attempts"] >= job["max_attempts"]
+        ]
+        for job in abandoned:
+            job.update(deepcopy(fields))
+            self._save("job", _key(job["id"]), job)
+        return len(abandoned)
+
+    async def update_job(self, job_id, fields, where=None, inc=None):
+        job = self.jobs.get(job_id)
+        if not job or any(job.get(k) != v for k, v in (where or {}).items()):
+            return
+        job.update(deepcopy(fields))
+        for k, v in (inc or {}).items():
+            job[k] = job.get(k, 0) + v
+        self._save("job", _key(job_id), job)
@@ -0,0 +1,176 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+
+EVENT_ADD = "add"
+EVENT_UPDATE = "update"
+EVENT_DELETE = "delete"
+EVENT_UNDO = "undo"
+
+
+def apply_item_events(items: List[dict], events: List[dict]) -> List[dict]:
+    # Undo events cancel their target; both are skipped when folding
+    undone = {event["target_seq"] for event in events if event["type"] == EVENT_UNDO}
+    folded = {item["id"]: dict(item) for item in items}
+    for event in events:
+        if event["type"] == EVENT_UNDO or event["seq"] in undone:
+            continue
+        item_id = event["item_id"]
+        if event["type"] == EVENT_ADD:
+            folded[item_id] = dict(event["data"])
+        elif event["type"] == EVENT_UPDATE:
+            if item_id in folded:
+                folded[item_id].update(event["data"])
+        elif event["type"] == EVENT_DELETE:
+            folded.pop(item_id, None)
+    return list(folded.values())
+
+
+def _unbroken_run(events: List[dict], after_seq: int, settled_before: datetime) -> List[dict]:
+    # Sequence numbers are allocated before the event is inserted, so a later
+    # event can already be stored while an earlier one is still in flight.
+    # Folding past that gap would move snapshot_seq over the missing event and
+    # it would never be applied. A gap behind an event created before
+    # `settled_before` is an append that failed after allocating its seq.
+    run = []
+    expected = after_seq + 1
+    for event in events:
+        if event["seq"] != expected and event["created_at"] >= settled_before:
+            break
+        run.append(event)
+        expected = event["seq"] + 1
+    return run
+
+
+def _fold_cut(events: List[dict], keep: int) -> int:
+    # Number of leading events that can be folded while leaving the last `keep`
+    # events undoable. An undo that stays behind must keep its target too.
+    cut = max(len(events) - keep, 0)
+    while cut > 0:
+        folded_seqs = {event["seq"] for event in events[:cut]}
+        targets = [event["target_seq"] for event in events[cut:]
+                   if event["type"] == EVENT_UNDO and event["target_seq"] in folded_seqs]
+        if not targets:
+            break
+        cut = next(index for index, event in enumerate(events) if event["seq"] == min(targets))
+    return cut
+
+
+class ItemEventLog:
+    """Append-only log of item mutations folded into the list's `items` snapshot.
+
+    Each list document keeps `event_seq` (last allocated sequence number) and
+    `snapshot_seq` (last event folded into `items`). Reads fold the events after
+    `snapshot_seq`; once more than `snapshot_every` are pending the fold is
+    written back, keeping the newest `undo_depth` events unfolded so they can
+    still be undone.
+    """
+
+    def __init__(self, repo, snapshot_every: int = 50, undo_depth: int = 20,
+                 gap_timeout: timedelta = timedelta(minutes=1)):
+        self.repo = repo
+        self.snapshot_every = snapshot_every
+        self.undo_depth = undo_depth
+        self.gap_timeout = gap_timeout
+
+    async def append(self, owner_id: str, list_id: str, event_type: str, item_id: Optional[str] = None,
+                     data: Optional[dict] = None, target_seq: Optional[int] = None) -> Optional[dict]:
+        now = datetime.utcnow()
+        # Allocating the sequence number also marks the list as touched
+        seq = await self.repo.next_event_seq(owner_id, list_id, now)
+        if seq is None:
+            return None
+        event = {
+            "owner_id": owner_id,
+            "list_id": list_id,
+            "seq": seq,
+            "type": event_type,
+            "item_id": item_id,
+            "data": data,
+            "target_seq": target_seq,
+            "folded": False,
+            "created_at": now,
+        }
+        await self.repo.insert_event(event)
+        return event
+
+    async def pending(self, travel_lists: List[dict]) -> Dict[str, List[dict]]:
+        if not travel_lists:
+            return {}
+        cursors = [(travel_list["owner_id"], travel_list["id"], travel_list.get("snapshot_seq") or 0)
+                   for travel_list in travel_lists]
+        by_list = {travel_list["id"]: [] for travel_list in travel_lists}
+        for event in await self.repo.find_events_after(cursors):
+            by_list[event["list_id"]].append(event)
+        return by_list
+
+    async def materialize(self, travel_list: dict) -> dict:
+        return (await self.materialize_many([travel_list]))[0]
+
+    async def materialize_many(self, travel_lists: List[dict]) -> List[dict]:
+        pending = await self.pending(travel_lists)
+        materialized = []
+        for travel_list in travel_lists:
+            events = pending.get(travel_list["id"], [])
+            if len(events) > self.snapshot_every:
+                await self.snapshot(travel_list["owner_id"], travel_list["id"], keep=self.undo_depth)
+            items = apply_item_events(travel_list.get("items", []), events)
+            materialized.append({**travel_list, "items": items})
+        return materialized
+
+    async def materialize_item(self, owner_id: str, list_id: str, item_id: str) -> Optional[dict]:
+        # Folds only this item's events, so item writes need not read the list
+        found = await self.repo.get_list_item(owner_id, list_id, item_id)
+        if not found:
+            return None
+        events = await self.repo.find_item_events_after(owner_id, list_id, item_id,
+                                                        found["snapshot_seq"] or 0)
+        items = apply_item_events([found["item"]] if found["item"] else [], events)
+        return items[0] if items else None
+
+    async def snapshot(self, owner_id: str, list_id: str, keep: int = 0) -> int:
+        travel_list = await self.repo.get_travel_list(owner_id, list_id)
+        if not travel_list:
+            return 0
+        events = (await self.pending([travel_list]))[list_id]
+        events = _unbroken_run(events, travel_list.get("snapshot_seq") or 0,
+                               datetime.utcnow() - self.gap_timeout)
+        cut = _fold_cut(events, keep)
+        if cut == 0:
+            return 0
+        snapshot_seq = events[cut - 1]["seq"]
+        # Only the writer that still sees the old snapshot_seq may fold
+        folded = await self.repo.set_items_snapshot(
+            owner_id, list_id, travel_list.get("snapshot_seq"),
+            apply_item_events(travel_list.get("items", []), events[:cut]), snapshot_seq,
+        )
+        if not folded:
+            return 0
+        await self.repo.mark_events_folded(owner_id, list_id, snapshot_seq)
+        return cut
+
+    async def undo(self, owner_id: str, list_id: str) -> Optional[dict]:
+        travel_list = await self.repo.get_travel_list(owner_id, list_id)
+        if not travel_list:
+            return None
+        events = (await self.pending([travel_list]))[list_id]
+        undone = {event["target_seq"] for event in events if event["type"] == EVENT_UNDO}
+        target = next((event for event in reversed(events)
+                       if event["type"] != EVENT_UNDO and event["seq"] not in undone), None)
+        if target is None:
+            return None
+        await self.append(owner_id, list_id, EVENT_UNDO, target["item_id"], target_seq=target["seq"])
+        return target
+
+    async def history(self, owner_id: str, list_id: str, item_id: Optional[str] = None,
+                      limit: int = 100) -> List[dict]:
+        return await self.repo.event_history(owner_id, list_id, item_id, limit)
+
+    async def compact(self, before: datetime, owner_id: Optional[str] = None) -> dict:
+        # Every owner's events when owner_id is None (the scheduled run)
+        snapshotted = 0
+        for list_owner, list_id in await self.repo.event_backlog(self.undo_depth, owner_id):
+            if await self.snapshot(list_owner, list_id, keep=self.undo_depth):
+                snapshotted += 1
+        deleted = await self.repo.delete_folded_events(before, owner_id)
+        return {"snapshotted": snapshotted, "deleted_events": deleted}
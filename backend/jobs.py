@@ -0,0 +1,245 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+import asyncio
+import logging
+import os
+import uuid
+
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+class JobContext:
+    # Handed to every handler so it can report progress and offload CPU work
+    def __init__(self, queue: "JobQueue", job: dict):
+        self.queue = queue
+        self.job = job
+        self.id = job["id"]
+
+    async def progress(self, done: int, total: int):
+        await self.queue.store.update_job(
+            self.id,
+            {
+                "progress": {"done": done, "total": total},
+                "lease_expires_at": self.queue.lease_deadline(),
+                "updated_at": datetime.utcnow(),
+            },
+            where={"status": JOB_RUNNING},
+        )
+
+    async def run_cpu(self, fn: Callable, *args):
+        # Runs in the process pool when configured, otherwise in a thread
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.queue.process_pool, fn, *args)
+
+
+Handler = Callable[..., Awaitable[object]]
+
+
+class JobQueue:
+    """Persistent job queue executed by a pool of asyncio workers.
+
+    Jobs live in the storage repository (the jobs collection on MongoDB) and
+    are claimed atomically with a lease, so several app instances can share
+    one queue and a job left behind by a crashed worker is picked up again
+    once its lease expires. Per-type `max_concurrency` limits are enforced
+    per process: with N instances a type can run up to N times the limit.
+    """
+
+    def __init__(self, store, workers: int = 4, processes: int = 0,
+                 max_attempts: int = 3, backoff_seconds: float = 2.0,
+                 lease_seconds: float = 300.0, poll_interval: float = 1.0):
+        self.store = store
+        self.workers = workers
+        self.processes = processes
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.worker_id = str(uuid.uuid4())
+        self.handlers: Dict[str, Handler] = {}
+        self.limits: Dict[str, int] = {}
+        self.running: Dict[str, int] = {}
+        self.process_pool: Optional[ProcessPoolExecutor] = None
+        self._tasks = []
+        self._wakeup = asyncio.Event()
+
+    def register(self, name: str, handler: Handler, max_concurrency: Optional[int] = None):
+        self.handlers[name] = handler
+        if max_concurrency:
+            self.limits[name] = max_concurrency
+
+    def lease_deadline(self) -> datetime:
+        return datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+
+    async def enqueue(self, name: str, params: Optional[dict] = None,
+                      owner_id: Optional[str] = None) -> dict:
+        if name not in self.handlers:
+            raise ValueError(f"Unknown job type: {name}")
+        now = datetime.utcnow()
+        job = {
+            "id": str(uuid.uuid4()),
+            "owner_id": owner_id,
+            "name": name,
+            "params": params or {},
+            "status": JOB_QUEUED,
+            "progress": {"done": 0, "total": 0},
+            "attempts": 0,
+            "max_attempts": self.max_attempts,
+            "result": None,
+            "error": None,
+            "run_after": now,
+            "created_at": now,
+            "updated_at": now,
+        }
+        await self.store.insert_job(job)
+        self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str, owner_id: Optional[str] = None) -> Optional[dict]:
+        return await self.store.get_job(job_id, owner_id)
+
+    async def start(self):
+        if self.processes > 0:
+            self.process_pool = ProcessPoolExecutor(max_workers=self.processes)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._reap()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.process_pool:
+            self.process_pool.shutdown(wait=False, cancel_futures=True)
+            self.process_pool = None
+
+    async def _claim(self) -> Optional[dict]:
+        now = datetime.utcnow()
+        # Take a slot of every limited type that has one free before awaiting
+        # the claim, so idle workers polling together cannot all claim the
+        # same type; the slots not used by the claimed job are given back
+        reserved = [name for name, limit in self.limits.items()
+                    if self.running.get(name, 0) < limit]
+        for name in reserved:
+            self.running[name] = self.running.get(name, 0) + 1
+        names = [name for name in self.handlers if name not in self.limits or name in reserved]
+        job = None
+        try:
+            job = await self.store.claim_job(names, now, {
+                "status": JOB_RUNNING,
+                "worker_id": self.worker_id,
+                "started_at": now,
+                "lease_expires_at": self.lease_deadline(),
+                "updated_at": now,
+            })
+        finally:
+            for name in reserved:
+                if job is None or job["name"] != name:
+                    self.running[name] -= 1
+        if job and job["name"] not in reserved:
+            self.running[job["name"]] = self.running.get(job["name"], 0) + 1
+        return job
+
+    async def _worker(self):
+        while True:
+            try:
+                job = await self._claim()
+            except Exception:
+                logger.exception("Failed to claim job")
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _reap(self):
+        # A job whose worker died (OOM, a crashed pool process) never reaches
+        # _fail. Claims skip it once its attempts are used up; this marks it
+        # failed so it does not stay "running" forever.
+        while True:
+            now = datetime.utcnow()
+            try:
+                failed = await self.store.fail_abandoned_jobs(now, {
+                    "status": JOB_FAILED,
+                    "error": "LeaseExpired: the worker stopped renewing the job's lease",
+                    "finished_at": now,
+                    "updated_at": now,
+                })
+                if failed:
+                    logger.warning("Marked %d abandoned jobs as failed", failed)
+            except Exception:
+                logger.exception("Failed to reap abandoned jobs")
+            await asyncio.sleep(self.lease_seconds / 3)
+
+    async def _heartbeat(self, job_id: str):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            await self.store.update_job(
+                job_id,
+                {"lease_expires_at": self.lease_deadline()},
+                where={"worker_id": self.worker_id, "status": JOB_RUNNING},
+            )
+
+    async def _run(self, job: dict):
+        # The running slot was taken by _claim
+        name = job["name"]
+        heartbeat = asyncio.create_task(self._heartbeat(job["id"]))
+        try:
+            result = await self.handlers[name](JobContext(self, job), **job["params"])
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back for another worker, unless it
+            # was already reclaimed or failed after its lease expired
+            await self.store.update_job(
+                job["id"],
+                {"status": JOB_QUEUED, "run_after": datetime.utcnow()},
+                where={"worker_id": self.worker_id, "status": JOB_RUNNING, "attempts": job["attempts"]},
+                inc={"attempts": -1},
+            )
+            raise
+        except Exception as exc:
+            logger.exception("Job %s (%s) failed on attempt %d", job["id"], name, job["attempts"])
+            await self._fail(job, exc)
+        else:
+            await self.store.update_job(job["id"], {
+                "status": JOB_SUCCEEDED,
+                "result": result,
+                "error": None,
+                "finished_at": datetime.utcnow(),
+                "updated_at": datetime.utcnow(),
+            })
+        finally:
+            heartbeat.cancel()
+            self.running[name] -= 1
+
+    async def _fail(self, job: dict, exc: Exception):
+        now = datetime.utcnow()
+        update = {"error": f"{type(exc).__name__}: {exc}", "updated_at": now}
+        if job["attempts"] < job.get("max_attempts", self.max_attempts):
+            # Exponential backoff: base, 2*base, 4*base, ...
+            delay = self.backoff_seconds * 2 ** (job["attempts"] - 1)
+            update.update(status=JOB_QUEUED, run_after=now + timedelta(seconds=delay))
+        else:
+            update.update(status=JOB_FAILED, finished_at=now)
+        await self.store.update_job(job["id"], update)
+
+
+def job_queue_from_env(store) -> JobQueue:
+    return JobQueue(
+        store,
+        workers=int(os.environ.get('JOB_WORKERS', '4')),
+        processes=int(os.environ.get('JOB_PROCESSES', '0')),
+        max_attempts=int(os.environ.get('JOB_MAX_ATTEMPTS', '3')),
+        backoff_seconds=float(os.environ.get('JOB_RETRY_BACKOFF_SECONDS', '2')),
+        lease_seconds=float(os.environ.get('JOB_LEASE_SECONDS', '300')),
+    )
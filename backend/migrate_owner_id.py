@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Backfill owner_id on data created before lists were owner-scoped.
+
+Assigns DEFAULT_OWNER_ID to every travel list, archived list and job that has
+no owner, replaces the old single-field `id` indexes with the owner-led
+compound indexes, and moves file-store archives into per-owner directories.
+Safe to run repeatedly. Run it before sharding travel_lists, since documents
+must carry every shard key field.
+
+Usage (from backend/): python migrate_owner_id.py [--owner OWNER_ID]
+"""
+
+import argparse
+import asyncio
+
+from pymongo.errors import OperationFailure
+
+import server
+from storage import MongoRepository
+
+
+async def drop_index_if_exists(collection, name):
+    try:
+        await collection.drop_index(name)
+        print(f"Dropped index {collection.name}.{name}")
+    except OperationFailure:
+        pass
+
+
+async def backfill(owner_id):
+    db = server.repo.db
+    missing = {"owner_id": {"$exists": False}}
+
+    for collection in (db.travel_lists, db.travel_lists_archive, db.jobs):
+        result = await collection.update_many(missing, {"$set": {"owner_id": owner_id}})
+        print(f"Backfilled owner_id on {result.modified_count} documents in {collection.name}")
+
+    # The single global summary is recomputed per owner by the analytics job
+    await db.analytics.delete_many(missing)
+
+    if server.ARCHIVE_STORE == 'file' and server.ARCHIVE_DIR.exists():
+        moved = 0
+        for path in server.ARCHIVE_DIR.glob("*.bson.z"):
+            travel_list = server._unpack_list(path.read_bytes())
+            travel_list.setdefault("owner_id", owner_id)
+            await server.archive_store.put(travel_list)
+            path.unlink()
+            moved += 1
+        print(f"Moved {moved} archived lists into {server.ARCHIVE_DIR / owner_id}")
+
+    await drop_index_if_exists(db.travel_lists, "id_1")
+    await drop_index_if_exists(db.travel_lists_archive, "id_1")
+    await server.repo.ensure_indexes()
+    print("Indexes are up to date")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--owner", default=server.DEFAULT_OWNER_ID,
+                        help="owner_id to assign to unowned data (default: DEFAULT_OWNER_ID)")
+    args = parser.parse_args()
+    if not isinstance(server.repo.resolve(), MongoRepository):
+        parser.error("only MongoDB data needs migrating (STORAGE_BACKEND=mongo)")
+    asyncio.run(backfill(args.owner))
+    server.repo.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# Seed data for new databases and new travel lists. Loaded on first use
+# rather than at import so it stays off the cold start path.
+
+default_categories = [
+    {"id": "clothes", "name": "Clothes", "name_ar": "الملابس", "icon": "👕", "color": "bg-blue-100 text-blue-800"},
+    {"id": "toiletries", "name": "Toiletries", "name_ar": "أدوات النظافة", "icon": "🧴", "color": "bg-green-100 text-green-800"},
+    {"id": "electronics", "name": "Electronics", "name_ar": "الإلكترونيات", "icon": "📱", "color": "bg-purple-100 text-purple-800"},
+    {"id": "documents", "name": "Documents", "name_ar": "الوثائق", "icon": "📄", "color": "bg-red-100 text-red-800"},
+    {"id": "medicine", "name": "Medicine", "name_ar": "الأدوية", "icon": "💊", "color": "bg-pink-100 text-pink-800"},
+    {"id": "miscellaneous", "name": "Miscellaneous", "name_ar": "متنوعات", "icon": "🎒", "color": "bg-yellow-100 text-yellow-800"}
+]
+
+default_items = [
+    # Clothes
+    {"name": "T-Shirts", "name_ar": "تيشيرتات", "category": "clothes"},
+    {"name": "Pants/Jeans", "name_ar": "بناطيل/جينز", "category": "clothes"},
+    {"name": "Underwear", "name_ar": "ملابس داخلية", "category": "clothes"},
+    {"name": "Socks", "name_ar": "جوارب", "category": "clothes"},
+    {"name": "Pajamas", "name_ar": "بيجامة", "category": "clothes"},
+    {"name": "Shoes", "name_ar": "أحذية", "category": "clothes"},
+    {"name": "Jacket/Coat", "name_ar": "جاكيت/معطف", "category": "clothes"},
+    {"name": "Swimwear", "name_ar": "ملابس السباحة", "category": "clothes"},
+    
+    # Toiletries
+    {"name": "Toothbrush", "name_ar": "فرشاة أسنان", "category": "toiletries"},
+    {"name": "Toothpaste", "name_ar": "معجون أسنان", "category": "toiletries"},
+    {"name": "Shampoo", "name_ar": "شامبو", "category": "toiletries"},
+    {"name": "Body Wash", "name_ar": "غسول الجسم", "category": "toiletries"},
+    {"name": "Deodorant", "name_ar": "مزيل العرق", "category": "toiletries"},
+    {"name": "Razor", "name_ar": "ماكينة حلاقة", "category": "toiletries"},
+    {"name": "Moisturizer", "name_ar": "مرطب", "category": "toiletries"},
+    {"name": "Sunscreen", "name_ar": "واقي شمس", "category": "toiletries"},
+    
+    # Electronics
+    {"name": "Phone Charger", "name_ar": "شاحن الهاتف", "category": "electronics"},
+    {"name": "Power Bank", "name_ar": "بطارية محمولة", "category": "electronics"},
+    {"name": "Camera", "name_ar": "كاميرا", "category": "electronics"},
+    {"name": "Headphones", "name_ar": "سماعات", "category": "electronics"},
+    {"name": "Adapter/Converter", "name_ar": "محول كهربائي", "category": "electronics"},
+    {"name": "Laptop", "name_ar": "حاسوب محمول", "category": "electronics"},
+    
+    # Documents
+    {"name": "Passport", "name_ar": "جواز السفر", "category": "documents"},
+    {"name": "Visa", "name_ar": "فيزا", "category": "documents"},
+    {"name": "Flight Tickets", "name_ar": "تذاكر الطيران", "category": "documents"},
+    {"name": "Hotel Reservations", "name_ar": "حجوزات الفندق", "category": "documents"},
+    {"name": "Travel Insurance", "name_ar": "تأمين السفر", "category": "documents"},
+    {"name": "Driver's License", "name_ar": "رخصة القيادة", "category": "documents"},
+    {"name": "ID Card", "name_ar": "بطاقة الهوية", "category": "documents"},
+    
+    # Medicine
+    {"name": "Prescription Medicines", "name_ar": "الأدوية الموصوفة", "category": "medicine"},
+    {"name": "Pain Relievers", "name_ar": "مسكنات الألم", "category": "medicine"},
+    {"name": "First Aid Kit", "name_ar": "حقيبة إسعافات أولية", "category": "medicine"},
+    {"name": "Vitamins", "name_ar": "فيتامينات", "category": "medicine"},
+    {"name": "Band-aids", "name_ar": "لاصقات طبية", "category": "medicine"},
+    
+    # Miscellaneous
+    {"name": "Sunglasses", "name_ar": "نظارات شمسية", "category": "miscellaneous"},
+    {"name": "Travel Pillow", "name_ar": "وسادة السفر", "category": "miscellaneous"},
+    {"name": "Snacks", "name_ar": "وجبات خفيفة", "category": "miscellaneous"},
+    {"name": "Water Bottle", "name_ar": "قارورة ماء", "category": "miscellaneous"},
+    {"name": "Books/E-reader", "name_ar": "كتب/قارئ إلكتروني", "category": "miscellaneous"},
+    {"name": "Travel Guide", "name_ar": "دليل السفر", "category": "miscellaneous"},
+    {"name": "Cash/Credit Cards", "name_ar": "نقود/بطاقات ائتمان", "category": "miscellaneous"}
+]
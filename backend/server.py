@@ -1,26 +1,61 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+# Taken before any other import so the startup log covers the whole cold start
+import time
+STARTED_AT = time.perf_counter()
+
+from fastapi import FastAPI, APIRouter, Depends, Header, HTTPException
+from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from storage import LazyRepository, repository_from_env
+from jobs import job_queue_from_env, JobContext
+from item_events import ItemEventLog, EVENT_ADD, EVENT_UPDATE, EVENT_DELETE
+import asyncio
+import json
 import os
 import logging
+import zlib
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Storage: MongoDB (MONGO_URL, DB_NAME) or the embedded engine with
+# STORAGE_BACKEND=embedded (see storage.py). The driver is imported and the
+# client created on first use, not at import.
+repo = LazyRepository(repository_from_env)
+
+# Requests without an X-Owner-Id header (and lists created before owners
+# existed, see migrate_owner_id.py) belong to this owner
+DEFAULT_OWNER_ID = os.environ.get('DEFAULT_OWNER_ID', 'default')
+
+# Archive settings: lists untouched for ARCHIVE_AFTER_DAYS are moved to a
+# compressed cold store ("database", i.e. the storage backend, or "file" directory)
+ARCHIVE_STORE = os.environ.get('ARCHIVE_STORE', 'database')
+ARCHIVE_DIR = Path(os.environ.get('ARCHIVE_DIR', ROOT_DIR / 'archive'))
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', '180'))
+ARCHIVE_INTERVAL_HOURS = float(os.environ.get('ARCHIVE_INTERVAL_HOURS', '0'))
+
+# Background jobs (see jobs.py for JOB_WORKERS, JOB_PROCESSES, JOB_MAX_ATTEMPTS, ...)
+job_queue = job_queue_from_env(repo)
+
+# Item event log: when enabled, item mutations are appended to item_events and
+# folded into the list's items on read (see item_events.py). Turning it off
+# again requires a compact-events run with EVENT_UNDO_DEPTH=0 first.
+ITEM_EVENT_LOG = os.environ.get('ITEM_EVENT_LOG', 'false').lower() == 'true'
+EVENT_SNAPSHOT_EVERY = int(os.environ.get('EVENT_SNAPSHOT_EVERY', '50'))
+EVENT_UNDO_DEPTH = int(os.environ.get('EVENT_UNDO_DEPTH', '20'))
+EVENT_RETENTION_DAYS = int(os.environ.get('EVENT_RETENTION_DAYS', '90'))
+EVENT_COMPACT_INTERVAL_HOURS = float(os.environ.get('EVENT_COMPACT_INTERVAL_HOURS', '0'))
+item_log = ItemEventLog(repo, snapshot_every=EVENT_SNAPSHOT_EVERY, undo_depth=EVENT_UNDO_DEPTH)
 
 # Create the main app without a prefix
 app = FastAPI()
+app.state.ready = False
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -57,6 +92,7 @@ class TravelCategory(BaseModel):
 
 class TravelList(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    owner_id: str = DEFAULT_OWNER_ID
     name: str
     destination: str = ""
     items: List[TravelItem] = []
@@ -67,208 +103,554 @@ class TravelListCreate(BaseModel):
     name: str
     destination: str = ""
 
-# Initialize default categories and items
-default_categories = [
-    {"id": "clothes", "name": "Clothes", "name_ar": "الملابس", "icon": "👕", "color": "bg-blue-100 text-blue-800"},
-    {"id": "toiletries", "name": "Toiletries", "name_ar": "أدوات النظافة", "icon": "🧴", "color": "bg-green-100 text-green-800"},
-    {"id": "electronics", "name": "Electronics", "name_ar": "الإلكترونيات", "icon": "📱", "color": "bg-purple-100 text-purple-800"},
-    {"id": "documents", "name": "Documents", "name_ar": "الوثائق", "icon": "📄", "color": "bg-red-100 text-red-800"},
-    {"id": "medicine", "name": "Medicine", "name_ar": "الأدوية", "icon": "💊", "color": "bg-pink-100 text-pink-800"},
-    {"id": "miscellaneous", "name": "Miscellaneous", "name_ar": "متنوعات", "icon": "🎒", "color": "bg-yellow-100 text-yellow-800"}
-]
-
-default_items = [
-    # Clothes
-    {"name": "T-Shirts", "name_ar": "تيشيرتات", "category": "clothes"},
-    {"name": "Pants/Jeans", "name_ar": "بناطيل/جينز", "category": "clothes"},
-    {"name": "Underwear", "name_ar": "ملابس داخلية", "category": "clothes"},
-    {"name": "Socks", "name_ar": "جوارب", "category": "clothes"},
-    {"name": "Pajamas", "name_ar": "بيجامة", "category": "clothes"},
-    {"name": "Shoes", "name_ar": "أحذية", "category": "clothes"},
-    {"name": "Jacket/Coat", "name_ar": "جاكيت/معطف", "category": "clothes"},
-    {"name": "Swimwear", "name_ar": "ملابس السباحة", "category": "clothes"},
-    
-    # Toiletries
-    {"name": "Toothbrush", "name_ar": "فرشاة أسنان", "category": "toiletries"},
-    {"name": "Toothpaste", "name_ar": "معجون أسنان", "category": "toiletries"},
-    {"name": "Shampoo", "name_ar": "شامبو", "category": "toiletries"},
-    {"name": "Body Wash", "name_ar": "غسول الجسم", "category": "toiletries"},
-    {"name": "Deodorant", "name_ar": "مزيل العرق", "category": "toiletries"},
-    {"name": "Razor", "name_ar": "ماكينة حلاقة", "category": "toiletries"},
-    {"name": "Moisturizer", "name_ar": "مرطب", "category": "toiletries"},
-    {"name": "Sunscreen", "name_ar": "واقي شمس", "category": "toiletries"},
-    
-    # Electronics
-    {"name": "Phone Charger", "name_ar": "شاحن الهاتف", "category": "electronics"},
-    {"name": "Power Bank", "name_ar": "بطارية محمولة", "category": "electronics"},
-    {"name": "Camera", "name_ar": "كاميرا", "category": "electronics"},
-    {"name": "Headphones", "name_ar": "سماعات", "category": "electronics"},
-    {"name": "Adapter/Converter", "name_ar": "محول كهربائي", "category": "electronics"},
-    {"name": "Laptop", "name_ar": "حاسوب محمول", "category": "electronics"},
+class TravelListUpdate(BaseModel):
+    name: Optional[str] = None
+    destination: Optional[str] = None
+
+class ArchivedTravelList(BaseModel):
+    id: str
+    name: str
+    destination: str = ""
+    updated_at: datetime
+    archived_at: datetime
+
+class ArchiveRun(BaseModel):
+    before: Optional[datetime] = None
+
+class JobProgress(BaseModel):
+    done: int = 0
+    total: int = 0
+
+class Job(BaseModel):
+    id: str
+    owner_id: Optional[str] = None
+    name: str
+    status: str
+    progress: JobProgress
+    attempts: int
+    max_attempts: int
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class TravelListImport(BaseModel):
+    name: str
+    destination: str = ""
+    # None seeds the default items, like POST /travel-lists
+    items: Optional[List[TravelItemCreate]] = None
+
+class BulkImport(BaseModel):
+    lists: List[TravelListImport]
+
+class ItemEvent(BaseModel):
+    seq: int
+    type: str
+    item_id: Optional[str] = None
+    data: Optional[Dict[str, Any]] = None
+    target_seq: Optional[int] = None
+    created_at: datetime
+
+class BulkListUpdate(BaseModel):
+    # None targets every travel list
+    list_ids: Optional[List[str]] = None
+    updates: Optional[TravelListUpdate] = None
+    item_updates: Optional[TravelItemUpdate] = None
+
+# Archive stores
+# Lists are stored as zlib-compressed BSON so datetimes round-trip unchanged.
+def _pack_list(travel_list: dict) -> bytes:
+    from bson import BSON
+
+    travel_list = {k: v for k, v in travel_list.items() if k != "_id"}
+    return zlib.compress(BSON.encode(travel_list))
+
+def _unpack_list(data: bytes) -> dict:
+    from bson import BSON
+
+    return BSON(zlib.decompress(data)).decode()
+
+def _archive_summary(travel_list: dict, archived_at: datetime) -> dict:
+    return {
+        "id": travel_list["id"],
+        "owner_id": travel_list["owner_id"],
+        "name": travel_list.get("name", ""),
+        "destination": travel_list.get("destination", ""),
+        "updated_at": travel_list.get("updated_at", archived_at),
+        "archived_at": archived_at,
+    }
+
+class DatabaseArchiveStore:
+    def __init__(self, repo):
+        self.repo = repo
+
+    async def put(self, travel_list: dict):
+        record = _archive_summary(travel_list, datetime.utcnow())
+        from bson import Binary
+
+        record["data"] = Binary(_pack_list(travel_list))
+        await self.repo.put_archived(record)
+
+    async def get(self, owner_id: str, list_id: str) -> Optional[dict]:
+        record = await self.repo.get_archived(owner_id, list_id)
+        return _unpack_list(record["data"]) if record else None
+
+    async def delete(self, owner_id: str, list_id: str):
+        await self.repo.delete_archived(owner_id, list_id)
+
+    async def list(self, owner_id: str) -> List[dict]:
+        return await self.repo.list_archived(owner_id)
+
+class FileArchiveStore:
+    def __init__(self, directory: Path):
+        self.directory = directory
+
+    # One directory per owner: <ARCHIVE_DIR>/<owner_id>/<list_id>.bson.z, next
+    # to a small <list_id>.json summary so listing never decompresses a list
+    def _path(self, owner_id: str, list_id: str, suffix: str = ".bson.z") -> Path:
+        for key in (owner_id, list_id):
+            if not key or Path(key).name != key or key.startswith("."):
+                raise HTTPException(status_code=400, detail="Invalid travel list id")
+        return self.directory / owner_id / f"{list_id}{suffix}"
+
+    def _replace(self, path: Path, data: bytes):
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_bytes(data)
+        tmp_path.replace(path)
+
+    def _write(self, owner_id: str, list_id: str, data: bytes, summary: dict):
+        path = self._path(owner_id, list_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._replace(path, data)
+        summary_json = json.dumps(summary, default=datetime.isoformat)
+        self._replace(self._path(owner_id, list_id, ".json"), summary_json.encode())
+
+    def _read(self, owner_id: str, list_id: str) -> Optional[bytes]:
+        path = self._path(owner_id, list_id)
+        return path.read_bytes() if path.exists() else None
+
+    def _delete(self, owner_id: str, list_id: str):
+        self._path(owner_id, list_id, ".json").unlink(missing_ok=True)
+        self._path(owner_id, list_id).unlink(missing_ok=True)
+
+    def _list(self, owner_id: str) -> List[dict]:
+        summaries = []
+        for path in sorted(self._path(owner_id, "_").parent.glob("*.bson.z")):
+            summary_path = self._path(owner_id, path.name[:-len(".bson.z")], ".json")
+            if summary_path.exists():
+                summary = json.loads(summary_path.read_text())
+                for key in ("updated_at", "archived_at"):
+                    summary[key] = datetime.fromisoformat(summary[key])
+            else:
+                # Archived before summaries were written
+                archived_at = datetime.utcfromtimestamp(path.stat().st_mtime)
+                summary = _archive_summary(_unpack_list(path.read_bytes()), archived_at)
+            summaries.append(summary)
+        return summaries
+
+    async def put(self, travel_list: dict):
+        summary = _archive_summary(travel_list, datetime.utcnow())
+        await asyncio.to_thread(
+            self._write, travel_list["owner_id"], travel_list["id"], _pack_list(travel_list), summary
+        )
+
+    async def get(self, owner_id: str, list_id: str) -> Optional[dict]:
+        data = await asyncio.to_thread(self._read, owner_id, list_id)
+        return _unpack_list(data) if data else None
+
+    async def delete(self, owner_id: str, list_id: str):
+        await asyncio.to_thread(self._delete, owner_id, list_id)
+
+    async def list(self, owner_id: str) -> List[dict]:
+        return await asyncio.to_thread(self._list, owner_id)
+
+if ARCHIVE_STORE == 'file':
+    archive_store = FileArchiveStore(ARCHIVE_DIR)
+else:
+    archive_store = DatabaseArchiveStore(repo)
+
+# Every write to a list changes at least one of these
+ARCHIVE_VERSION_FIELDS = ("updated_at", "event_seq", "snapshot_seq")
+
+async def archive_travel_list(owner_id: str, list_id: str) -> bool:
+    if ITEM_EVENT_LOG:
+        # Archived lists carry every event folded in
+        await item_log.snapshot(owner_id, list_id)
+    travel_list = await repo.get_travel_list(owner_id, list_id)
+    if not travel_list:
+        return False
+    # Write to the cold store first so a crash never loses the list
+    await archive_store.put(travel_list)
+    # Only delete the version that was archived. A write that landed in
+    # between keeps the list active and the archived copy is dropped.
+    archived_version = {field: travel_list.get(field) for field in ARCHIVE_VERSION_FIELDS}
+    if not await repo.delete_travel_list(owner_id, list_id, where=archived_version):
+        await archive_store.delete(owner_id, list_id)
+        return False
+    return True
+
+async def rehydrate_travel_list(owner_id: str, list_id: str) -> Optional[dict]:
+    travel_list = await archive_store.get(owner_id, list_id)
+    if not travel_list:
+        return None
+    # Rehydrating counts as a touch, otherwise the next run archives it again
+    travel_list["owner_id"] = owner_id
+    travel_list["updated_at"] = datetime.utcnow()
+    await repo.replace_travel_list(travel_list)
+    await archive_store.delete(owner_id, list_id)
+    return travel_list
+
+async def archive_stale_lists(before: Optional[datetime] = None, owner_id: Optional[str] = None) -> int:
+    # Every owner's lists when owner_id is None (the scheduled run)
+    if before is None:
+        before = datetime.utcnow() - timedelta(days=ARCHIVE_AFTER_DAYS)
+    archived = 0
+    for travel_list in await repo.find_stale_lists(before, owner_id=owner_id):
+        if await archive_travel_list(travel_list["owner_id"], travel_list["id"]):
+            archived += 1
+    logger.info("Archived %d travel lists untouched since %s", archived, before.isoformat())
+    return archived
+
+async def find_travel_list(owner_id: str, list_id: str) -> Optional[dict]:
+    travel_list = await repo.get_travel_list(owner_id, list_id)
+    if not travel_list:
+        travel_list = await rehydrate_travel_list(owner_id, list_id)
+    if travel_list and ITEM_EVENT_LOG:
+        travel_list = await item_log.materialize(travel_list)
+    return travel_list
+
+async def get_owner_id(x_owner_id: Optional[str] = Header(None)) -> str:
+    return x_owner_id or DEFAULT_OWNER_ID
+
+def compute_list_stats(items: List[dict]) -> dict:
+    total_items = len(items)
+    packed_items = len([item for item in items if item.get("is_packed", False)])
     
-    # Documents
-    {"name": "Passport", "name_ar": "جواز السفر", "category": "documents"},
-    {"name": "Visa", "name_ar": "فيزا", "category": "documents"},
-    {"name": "Flight Tickets", "name_ar": "تذاكر الطيران", "category": "documents"},
-    {"name": "Hotel Reservations", "name_ar": "حجوزات الفندق", "category": "documents"},
-    {"name": "Travel Insurance", "name_ar": "تأمين السفر", "category": "documents"},
-    {"name": "Driver's License", "name_ar": "رخصة القيادة", "category": "documents"},
-    {"name": "ID Card", "name_ar": "بطاقة الهوية", "category": "documents"},
+    progress_percentage = (packed_items / total_items * 100) if total_items > 0 else 0
     
-    # Medicine
-    {"name": "Prescription Medicines", "name_ar": "الأدوية الموصوفة", "category": "medicine"},
-    {"name": "Pain Relievers", "name_ar": "مسكنات الألم", "category": "medicine"},
-    {"name": "First Aid Kit", "name_ar": "حقيبة إسعافات أولية", "category": "medicine"},
-    {"name": "Vitamins", "name_ar": "فيتامينات", "category": "medicine"},
-    {"name": "Band-aids", "name_ar": "لاصقات طبية", "category": "medicine"},
+    # Category-wise stats
+    category_stats = {}
+    for item in items:
+        category = item.get("category", "miscellaneous")
+        if category not in category_stats:
+            category_stats[category] = {"total": 0, "packed": 0}
+        category_stats[category]["total"] += 1
+        if item.get("is_packed", False):
+            category_stats[category]["packed"] += 1
     
-    # Miscellaneous
-    {"name": "Sunglasses", "name_ar": "نظارات شمسية", "category": "miscellaneous"},
-    {"name": "Travel Pillow", "name_ar": "وسادة السفر", "category": "miscellaneous"},
-    {"name": "Snacks", "name_ar": "وجبات خفيفة", "category": "miscellaneous"},
-    {"name": "Water Bottle", "name_ar": "قارورة ماء", "category": "miscellaneous"},
-    {"name": "Books/E-reader", "name_ar": "كتب/قارئ إلكتروني", "category": "miscellaneous"},
-    {"name": "Travel Guide", "name_ar": "دليل السفر", "category": "miscellaneous"},
-    {"name": "Cash/Credit Cards", "name_ar": "نقود/بطاقات ائتمان", "category": "miscellaneous"}
-]
+    return {
+        "total_items": total_items,
+        "packed_items": packed_items,
+        "remaining_items": total_items - packed_items,
+        "progress_percentage": round(progress_percentage, 1),
+        "category_stats": category_stats
+    }
+
+def new_travel_list(owner_id: str, name: str, destination: str = "",
+                    items: Optional[List[TravelItemCreate]] = None) -> TravelList:
+    if items is None:
+        from seed_data import default_items
+
+        items = [TravelItem(**item_data) for item_data in default_items]
+    else:
+        items = [TravelItem(**item.dict()) for item in items]
+    return TravelList(owner_id=owner_id, name=name, destination=destination,
+                      items=[item.dict() for item in items])
+
+# Job handlers
+JOB_BATCH_SIZE = 100
+
+async def bulk_import_job(job: JobContext, owner_id: str, lists: List[dict]) -> dict:
+    # Re-runs after a retry must not duplicate lists, so ids are fixed per job
+    imported = 0
+    for start in range(0, len(lists), JOB_BATCH_SIZE):
+        batch = lists[start:start + JOB_BATCH_SIZE]
+        for offset, data in enumerate(batch):
+            list_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{job.id}/{start + offset}"))
+            list_import = TravelListImport(**data)
+            travel_list = new_travel_list(owner_id, list_import.name, list_import.destination,
+                                          list_import.items)
+            travel_list.id = list_id
+            await repo.replace_travel_list(travel_list.dict())
+            imported += 1
+        await job.progress(imported, len(lists))
+    return {"imported": imported}
+
+async def bulk_update_job(job: JobContext, owner_id: str, list_ids: Optional[List[str]],
+                          updates: Optional[dict], item_updates: Optional[dict]) -> dict:
+    # Params are re-validated so only the model fields are ever $set
+    now = datetime.utcnow()
+    list_set = TravelListUpdate(**(updates or {})).dict(exclude_none=True)
+    list_set["updated_at"] = now
+    item_set = {}
+    if item_updates:
+        item_set = TravelItemUpdate(**item_updates).dict(exclude_none=True)
+        item_set["updated_at"] = now
+    modified = 0
+    done = 0
+    ids = await repo.list_travel_list_ids(owner_id, list_ids)
+    for start in range(0, len(ids), JOB_BATCH_SIZE):
+        batch = ids[start:start + JOB_BATCH_SIZE]
+        if ITEM_EVENT_LOG and item_updates:
+            # Fold pending events first so they are not replayed over the update
+            for list_id in batch:
+                await item_log.snapshot(owner_id, list_id)
+        modified += await repo.bulk_update_travel_lists(owner_id, batch, list_set, item_set)
+        done += len(batch)
+        await job.progress(done, len(ids))
+    return {"matched": done, "modified": modified}
+
+def summarize_lists(travel_lists: List[dict]) -> dict:
+    # Runs through JobContext.run_cpu, in the JOB_PROCESSES pool when set
+    summary = {"total_lists": 0, "total_items": 0, "packed_items": 0, "category_stats": {}}
+    for travel_list in travel_lists:
+        stats = compute_list_stats(travel_list.get("items", []))
+        summary["total_lists"] += 1
+        summary["total_items"] += stats["total_items"]
+        summary["packed_items"] += stats["packed_items"]
+        for category, counts in stats["category_stats"].items():
+            totals = summary["category_stats"].setdefault(category, {"total": 0, "packed": 0})
+            totals["total"] += counts["total"]
+            totals["packed"] += counts["packed"]
+    return summary
+
+async def analytics_refresh_job(job: JobContext, owner_id: str) -> dict:
+    total = await repo.count_travel_lists(owner_id)
+    summary = {"total_lists": 0, "total_items": 0, "packed_items": 0, "category_stats": {}}
+    async for batch in repo.iter_travel_lists(owner_id, JOB_BATCH_SIZE):
+        if ITEM_EVENT_LOG:
+            batch = await item_log.materialize_many(batch)
+        batch_summary = await job.run_cpu(summarize_lists, batch)
+        for key in ("total_lists", "total_items", "packed_items"):
+            summary[key] += batch_summary[key]
+        for category, counts in batch_summary["category_stats"].items():
+            totals = summary["category_stats"].setdefault(category, {"total": 0, "packed": 0})
+            totals["total"] += counts["total"]
+            totals["packed"] += counts["packed"]
+        await job.progress(summary["total_lists"], total)
+    summary["refreshed_at"] = datetime.utcnow()
+    await repo.put_analytics(owner_id, summary)
+    return {"total_lists": summary["total_lists"]}
+
+async def archive_job(job: JobContext, before: Optional[datetime] = None,
+                      owner_id: Optional[str] = None) -> dict:
+    return {"archived": await archive_stale_lists(before, owner_id=owner_id)}
+
+async def compact_events_job(job: JobContext, owner_id: Optional[str] = None) -> dict:
+    before = datetime.utcnow() - timedelta(days=EVENT_RETENTION_DAYS)
+    return await item_log.compact(before, owner_id=owner_id)
+
+job_queue.register("bulk_import", bulk_import_job)
+job_queue.register("bulk_update", bulk_update_job, max_concurrency=1)
+job_queue.register("analytics_refresh", analytics_refresh_job, max_concurrency=1)
+job_queue.register("archive", archive_job, max_concurrency=1)
+job_queue.register("compact_events", compact_events_job, max_concurrency=1)
 
 # API Routes
 
 # Get all categories
 @api_router.get("/categories", response_model=List[TravelCategory])
 async def get_categories():
-    categories = await db.categories.find().to_list(1000)
+    categories = await repo.list_categories()
     if not categories:
         # Initialize default categories
-        for cat in default_categories:
-            await db.categories.insert_one(cat)
-        categories = await db.categories.find().to_list(1000)
+        from seed_data import default_categories
+
+        await repo.insert_categories(default_categories)
+        categories = await repo.list_categories()
     return [TravelCategory(**cat) for cat in categories]
 
 # Get all travel lists
 @api_router.get("/travel-lists", response_model=List[TravelList])
-async def get_travel_lists():
-    lists = await db.travel_lists.find().to_list(1000)
+async def get_travel_lists(owner_id: str = Depends(get_owner_id)):
+    lists = await repo.list_travel_lists(owner_id)
+    if ITEM_EVENT_LOG:
+        lists = await item_log.materialize_many(lists)
     return [TravelList(**travel_list) for travel_list in lists]
 
 # Create a new travel list
 @api_router.post("/travel-lists", response_model=TravelList)
-async def create_travel_list(travel_list: TravelListCreate):
+async def create_travel_list(travel_list: TravelListCreate, owner_id: str = Depends(get_owner_id)):
     # Create default items for the new list
-    items = []
-    for item_data in default_items:
-        item = TravelItem(**item_data)
-        items.append(item.dict())
-    
-    new_list = TravelList(
-        name=travel_list.name,
-        destination=travel_list.destination,
-        items=items
-    )
+    new_list = new_travel_list(owner_id, travel_list.name, travel_list.destination)
     
-    await db.travel_lists.insert_one(new_list.dict())
+    await repo.insert_travel_list(new_list.dict())
     return new_list
 
 # Get a specific travel list
 @api_router.get("/travel-lists/{list_id}", response_model=TravelList)
-async def get_travel_list(list_id: str):
-    travel_list = await db.travel_lists.find_one({"id": list_id})
+async def get_travel_list(list_id: str, owner_id: str = Depends(get_owner_id)):
+    travel_list = await find_travel_list(owner_id, list_id)
     if not travel_list:
         raise HTTPException(status_code=404, detail="Travel list not found")
     return TravelList(**travel_list)
 
 # Update travel list
 @api_router.put("/travel-lists/{list_id}", response_model=TravelList)
-async def update_travel_list(list_id: str, updates: dict):
-    updates["updated_at"] = datetime.utcnow()
-    result = await db.travel_lists.update_one(
-        {"id": list_id}, 
-        {"$set": updates}
-    )
-    if result.matched_count == 0:
+async def update_travel_list(list_id: str, updates: TravelListUpdate, owner_id: str = Depends(get_owner_id)):
+    update_dict = updates.dict(exclude_none=True)
+    update_dict["updated_at"] = datetime.utcnow()
+    if not await repo.update_travel_list(owner_id, list_id, update_dict):
         raise HTTPException(status_code=404, detail="Travel list not found")
     
-    updated_list = await db.travel_lists.find_one({"id": list_id})
+    updated_list = await find_travel_list(owner_id, list_id)
     return TravelList(**updated_list)
 
 # Add item to travel list
 @api_router.post("/travel-lists/{list_id}/items", response_model=TravelItem)
-async def add_item_to_list(list_id: str, item: TravelItemCreate):
+async def add_item_to_list(list_id: str, item: TravelItemCreate, owner_id: str = Depends(get_owner_id)):
     new_item = TravelItem(**item.dict())
     
-    result = await db.travel_lists.update_one(
-        {"id": list_id},
-        {"$push": {"items": new_item.dict()}}
-    )
+    if ITEM_EVENT_LOG:
+        if not await item_log.append(owner_id, list_id, EVENT_ADD, new_item.id, new_item.dict()):
+            raise HTTPException(status_code=404, detail="Travel list not found")
+        return new_item
     
-    if result.matched_count == 0:
+    if not await repo.push_item(owner_id, list_id, new_item.dict()):
         raise HTTPException(status_code=404, detail="Travel list not found")
     
     return new_item
 
 # Update item in travel list
 @api_router.put("/travel-lists/{list_id}/items/{item_id}", response_model=TravelItem)
-async def update_item_in_list(list_id: str, item_id: str, updates: TravelItemUpdate):
+async def update_item_in_list(list_id: str, item_id: str, updates: TravelItemUpdate,
+                              owner_id: str = Depends(get_owner_id)):
     update_dict = {k: v for k, v in updates.dict().items() if v is not None}
     update_dict["updated_at"] = datetime.utcnow()
     
-    result = await db.travel_lists.update_one(
-        {"id": list_id, "items.id": item_id},
-        {"$set": {f"items.$.{k}": v for k, v in update_dict.items()}}
-    )
+    if ITEM_EVENT_LOG:
+        current_item = await item_log.materialize_item(owner_id, list_id, item_id)
+        if not current_item:
+            raise HTTPException(status_code=404, detail="Travel list or item not found")
+        if not await item_log.append(owner_id, list_id, EVENT_UPDATE, item_id, update_dict):
+            raise HTTPException(status_code=404, detail="Travel list or item not found")
+        return TravelItem(**{**current_item, **update_dict})
     
-    if result.matched_count == 0:
+    updated_item = await repo.update_item(owner_id, list_id, item_id, update_dict)
+    if not updated_item:
         raise HTTPException(status_code=404, detail="Travel list or item not found")
     
-    # Get the updated item
-    travel_list = await db.travel_lists.find_one({"id": list_id})
-    updated_item = next((item for item in travel_list["items"] if item["id"] == item_id), None)
-    
     return TravelItem(**updated_item)
 
 # Delete item from travel list
 @api_router.delete("/travel-lists/{list_id}/items/{item_id}")
-async def delete_item_from_list(list_id: str, item_id: str):
-    result = await db.travel_lists.update_one(
-        {"id": list_id},
-        {"$pull": {"items": {"id": item_id}}}
-    )
+async def delete_item_from_list(list_id: str, item_id: str, owner_id: str = Depends(get_owner_id)):
+    if ITEM_EVENT_LOG:
+        if not await item_log.append(owner_id, list_id, EVENT_DELETE, item_id):
+            raise HTTPException(status_code=404, detail="Travel list not found")
+        return {"message": "Item deleted successfully"}
     
-    if result.matched_count == 0:
+    if not await repo.pull_item(owner_id, list_id, item_id):
         raise HTTPException(status_code=404, detail="Travel list not found")
     
     return {"message": "Item deleted successfully"}
 
 # Get progress statistics
 @api_router.get("/travel-lists/{list_id}/stats")
-async def get_list_stats(list_id: str):
-    travel_list = await db.travel_lists.find_one({"id": list_id})
+async def get_list_stats(list_id: str, owner_id: str = Depends(get_owner_id)):
+    travel_list = await find_travel_list(owner_id, list_id)
     if not travel_list:
         raise HTTPException(status_code=404, detail="Travel list not found")
     
-    items = travel_list.get("items", [])
-    total_items = len(items)
-    packed_items = len([item for item in items if item.get("is_packed", False)])
-    
-    progress_percentage = (packed_items / total_items * 100) if total_items > 0 else 0
-    
-    # Category-wise stats
-    category_stats = {}
-    for item in items:
-        category = item.get("category", "miscellaneous")
-        if category not in category_stats:
-            category_stats[category] = {"total": 0, "packed": 0}
-        category_stats[category]["total"] += 1
-        if item.get("is_packed", False):
-            category_stats[category]["packed"] += 1
-    
-    return {
-        "total_items": total_items,
-        "packed_items": packed_items,
-        "remaining_items": total_items - packed_items,
-        "progress_percentage": round(progress_percentage, 1),
-        "category_stats": category_stats
-    }
+    return compute_list_stats(travel_list.get("items", []))
+
+# Item change history, newest first (requires ITEM_EVENT_LOG)
+@api_router.get("/travel-lists/{list_id}/history", response_model=List[ItemEvent])
+async def get_list_history(list_id: str, item_id: Optional[str] = None, limit: int = 100,
+                           owner_id: str = Depends(get_owner_id)):
+    if not ITEM_EVENT_LOG:
+        raise HTTPException(status_code=404, detail="Item history is not enabled")
+    if not await repo.get_travel_list(owner_id, list_id):
+        raise HTTPException(status_code=404, detail="Travel list not found")
+    events = await item_log.history(owner_id, list_id, item_id=item_id, limit=min(limit, 1000))
+    return [ItemEvent(**event) for event in events]
+
+# Undo the latest item change that has not been undone yet (requires ITEM_EVENT_LOG)
+@api_router.post("/travel-lists/{list_id}/undo", response_model=ItemEvent)
+async def undo_last_change(list_id: str, owner_id: str = Depends(get_owner_id)):
+    if not ITEM_EVENT_LOG:
+        raise HTTPException(status_code=404, detail="Item history is not enabled")
+    if not await repo.get_travel_list(owner_id, list_id):
+        raise HTTPException(status_code=404, detail="Travel list not found")
+    undone = await item_log.undo(owner_id, list_id)
+    if not undone:
+        raise HTTPException(status_code=409, detail="Nothing to undo")
+    return ItemEvent(**undone)
+
+# List archived travel lists
+@api_router.get("/archive", response_model=List[ArchivedTravelList])
+async def get_archived_lists(owner_id: str = Depends(get_owner_id)):
+    return [ArchivedTravelList(**record) for record in await archive_store.list(owner_id)]
+
+# Archive the owner's lists untouched since `before` (defaults to ARCHIVE_AFTER_DAYS ago)
+@api_router.post("/archive/run", response_model=Job, status_code=202)
+async def run_archive(run: ArchiveRun, owner_id: str = Depends(get_owner_id)):
+    params = {"owner_id": owner_id, **run.dict()}
+    return Job(**await job_queue.enqueue("archive", params, owner_id=owner_id))
+
+# Archive a specific travel list
+@api_router.post("/travel-lists/{list_id}/archive")
+async def archive_list(list_id: str, owner_id: str = Depends(get_owner_id)):
+    if not await archive_travel_list(owner_id, list_id):
+        raise HTTPException(status_code=404, detail="Travel list not found")
+    return {"message": "Travel list archived successfully"}
+
+# Restore an archived travel list to the active collection
+@api_router.post("/travel-lists/{list_id}/unarchive", response_model=TravelList)
+async def unarchive_list(list_id: str, owner_id: str = Depends(get_owner_id)):
+    travel_list = await rehydrate_travel_list(owner_id, list_id)
+    if not travel_list:
+        raise HTTPException(status_code=404, detail="Archived travel list not found")
+    return TravelList(**travel_list)
+
+# Import many travel lists in the background
+@api_router.post("/jobs/bulk-import", response_model=Job, status_code=202)
+async def start_bulk_import(bulk_import: BulkImport, owner_id: str = Depends(get_owner_id)):
+    params = {"owner_id": owner_id, **bulk_import.dict()}
+    return Job(**await job_queue.enqueue("bulk_import", params, owner_id=owner_id))
+
+# Apply the same list and/or item updates to many travel lists in the background
+@api_router.post("/jobs/bulk-update", response_model=Job, status_code=202)
+async def start_bulk_update(bulk_update: BulkListUpdate, owner_id: str = Depends(get_owner_id)):
+    params = {"owner_id": owner_id, **bulk_update.dict()}
+    return Job(**await job_queue.enqueue("bulk_update", params, owner_id=owner_id))
+
+# Recompute the owner's cross-list analytics summary in the background
+@api_router.post("/jobs/analytics-refresh", response_model=Job, status_code=202)
+async def start_analytics_refresh(owner_id: str = Depends(get_owner_id)):
+    params = {"owner_id": owner_id}
+    return Job(**await job_queue.enqueue("analytics_refresh", params, owner_id=owner_id))
+
+# Snapshot the owner's long event backlogs and drop their folded events past EVENT_RETENTION_DAYS
+@api_router.post("/jobs/compact-events", response_model=Job, status_code=202)
+async def start_compact_events(owner_id: str = Depends(get_owner_id)):
+    params = {"owner_id": owner_id}
+    return Job(**await job_queue.enqueue("compact_events", params, owner_id=owner_id))
+
+# Get job status and progress
+@api_router.get("/jobs/{job_id}", response_model=Job)
+async def get_job(job_id: str, owner_id: str = Depends(get_owner_id)):
+    job = await job_queue.get(job_id, owner_id=owner_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return Job(**job)
+
+# Get the latest analytics summary
+@api_router.get("/analytics")
+async def get_analytics(owner_id: str = Depends(get_owner_id)):
+    summary = await repo.get_analytics(owner_id)
+    if not summary:
+        raise HTTPException(status_code=404, detail="Analytics not computed yet")
+    return summary
+
+# Readiness probe: 503 until storage, indexes and background workers are up
+@api_router.get("/ready")
+async def get_readiness():
+    if not app.state.ready:
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready"}
 
 # Include the router in the main app
 app.include_router(api_router)
@@ -288,6 +670,46 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+async def enqueue_periodically(job_name: str, interval_hours: float):
+    while True:
+        await asyncio.sleep(interval_hours * 3600)
+        try:
+            await job_queue.enqueue(job_name)
+        except Exception:
+            logger.exception("Scheduling %s run failed", job_name)
+
+async def warm_up():
+    # Connect to storage, then start the optional subsystems. The server is
+    # already accepting connections meanwhile; /api/ready flips at the end.
+    delay = 1
+    while True:
+        try:
+            await repo.ensure_indexes()
+            break
+        except Exception:
+            logger.exception("Storage is not reachable, retrying in %ds", delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+    import seed_data  # noqa: F401  (so the first new list does not pay for it)
+    await job_queue.start()
+    app.state.periodic_tasks = [
+        asyncio.create_task(enqueue_periodically(job_name, interval_hours))
+        for job_name, interval_hours in (("archive", ARCHIVE_INTERVAL_HOURS),
+                                         ("compact_events", EVENT_COMPACT_INTERVAL_HOURS))
+        if interval_hours > 0
+    ]
+    app.state.ready = True
+    logger.info("Ready %.0f ms after import started", (time.perf_counter() - STARTED_AT) * 1000)
+
+@app.on_event("startup")
+async def startup_db_client():
+    app.state.periodic_tasks = []
+    app.state.warm_up_task = asyncio.create_task(warm_up())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    app.state.warm_up_task.cancel()
+    for task in app.state.periodic_tasks:
+        task.cancel()
+    await job_queue.stop()
+    repo.close()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Checks that owner-scoped travel list queries are routed to a single shard.
+
+Seeds lists for a few owners through the mongos in MONGO_URL, splits the
+collection so owners land on different shards, then runs explain() on the
+queries server.py issues and reports how many shards each one touched.
+
+Usage (from backend/, against the cluster in sharding/docker-compose.yml):
+    python sharding/check_targeting.py
+"""
+
+import os
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+load_dotenv(Path(__file__).parent.parent / '.env')
+
+OWNERS = ["alice", "bob", "carol", "dave"]
+
+
+def shards_used(explain):
+    plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+    return [shard["shardName"] for shard in plan.get("shards", [])]
+
+
+def main():
+    client = MongoClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    admin = client.admin
+    namespace = f"{db.name}.travel_lists"
+
+    for owner_id in OWNERS:
+        db.travel_lists.replace_one(
+            {"owner_id": owner_id, "id": f"{owner_id}-list"},
+            {"owner_id": owner_id, "id": f"{owner_id}-list", "name": "Trip", "items": []},
+            upsert=True,
+        )
+
+    # Split between owners and move every other chunk so both shards hold data
+    shards = [shard["_id"] for shard in admin.command("listShards")["shards"]]
+    for index, owner_id in enumerate(OWNERS):
+        middle = {"owner_id": owner_id, "id": ""}
+        try:
+            admin.command("split", namespace, middle=middle)
+        except Exception:
+            pass
+        try:
+            admin.command("moveChunk", namespace, find=middle, to=shards[index % len(shards)])
+        except Exception:
+            pass
+
+    queries = {
+        "get_travel_lists": {"owner_id": "alice"},
+        "get_travel_list": {"owner_id": "alice", "id": "alice-list"},
+        "legacy id-only lookup": {"id": "alice-list"},
+    }
+    targeted = True
+    for name, query in queries.items():
+        used = shards_used(db.command("explain", {"find": "travel_lists", "filter": query}))
+        print(f"{name:24} {query} -> {len(used)} shard(s) {used}")
+        if "owner_id" in query and len(used) != 1:
+            targeted = False
+
+    sys.exit(0 if targeted else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+#!/usr/bin/env bash
+# Initiates the replica sets of docker-compose.yml, registers both shards and
+# shards the travel list collections on (owner_id, id).
+set -euo pipefail
+
+cd "$(dirname "$0")"
+DB_NAME="${DB_NAME:-test_database}"
+compose="docker compose -f docker-compose.yml"
+
+$compose exec -T configsvr mongosh --quiet --port 27019 --eval \
+  'rs.initiate({_id: "cfg", configsvr: true, members: [{_id: 0, host: "configsvr:27019"}]})'
+for shard in shard1 shard2; do
+  $compose exec -T "$shard" mongosh --quiet --port 27018 --eval \
+    "rs.initiate({_id: \"$shard\", members: [{_id: 0, host: \"$shard:27018\"}]})"
+done
+
+# Give the replica sets a moment to elect primaries
+sleep 10
+
+$compose exec -T mongos mongosh --quiet --eval "
+  sh.addShard('shard1/shard1:27018');
+  sh.addShard('shard2/shard2:27018');
+  sh.enableSharding('$DB_NAME');
+  sh.shardCollection('$DB_NAME.travel_lists', {owner_id: 1, id: 1});
+  sh.shardCollection('$DB_NAME.travel_lists_archive', {owner_id: 1, id: 1});
+"
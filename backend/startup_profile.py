@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Cold start profile for the backend.
+
+Reports import time per top-level module (from `python -X importtime` in a
+fresh interpreter), then imports server.py in this process and times app
+startup, readiness (/api/ready) and the first request.
+
+Usage (from backend/):
+    python startup_profile.py [--top 15] [--budget-ms 500]
+
+Exits non-zero when import plus readiness exceeds the budget. Set
+STORAGE_BACKEND=embedded to profile without a MongoDB server.
+"""
+
+import argparse
+import asyncio
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent
+
+
+def import_times(module="server"):
+    # Cumulative microseconds of each module `module` imports directly, grouped
+    # by root package, plus the module's own code, from -X importtime
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        sys.exit(result.stderr)
+    totals = defaultdict(int)
+    children = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # Children are printed before their parent, indented two extra spaces
+        # per nesting level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children.append((name.strip(), int(cumulative_us)))
+        elif depth == 0:
+            if name.strip() == module:
+                totals[f"{module} (own code)"] += int(self_us)
+                for child, child_us in children:
+                    totals[child.split(".")[0]] += child_us
+            children = []
+    return sorted(totals.items(), key=lambda entry: entry[1], reverse=True)
+
+
+async def time_startup(app, timeout):
+    import httpx
+
+    timings = {}
+    started = time.perf_counter()
+    await app.router.startup()
+    timings["startup events"] = time.perf_counter() - started
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://profile") as client:
+        while (await client.get("/api/ready")).status_code != 200:
+            if time.perf_counter() - started > timeout:
+                raise TimeoutError("backend did not become ready")
+            await asyncio.sleep(0.005)
+        timings["ready"] = time.perf_counter() - started
+
+        request_started = time.perf_counter()
+        response = await client.get("/api/categories")
+        response.raise_for_status()
+        timings["first request (/api/categories)"] = time.perf_counter() - request_started
+
+    await app.router.shutdown()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile backend cold start")
+    parser.add_argument("--top", type=int, default=15, help="modules to list (default: 15)")
+    parser.add_argument("--budget-ms", type=float, default=500,
+                        help="import + readiness budget in milliseconds (default: 500)")
+    parser.add_argument("--timeout", type=float, default=10,
+                        help="seconds to wait for readiness (default: 10)")
+    args = parser.parse_args()
+
+    print("Import time of server.py and what it imports (fresh interpreter):")
+    for name, cumulative_us in import_times()[:args.top]:
+        print(f"  {name:32} {cumulative_us / 1000:8.1f} ms")
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    started = time.perf_counter()
+    import server
+    import_ms = (time.perf_counter() - started) * 1000
+
+    try:
+        timings = asyncio.run(time_startup(server.app, args.timeout))
+    except TimeoutError:
+        sys.exit(f"Not ready after {args.timeout:.0f}s: is the storage backend reachable?")
+    print("\nServer initialization:")
+    print(f"  {'import server':32} {import_ms:8.1f} ms")
+    for name, seconds in timings.items():
+        print(f"  {name:32} {seconds * 1000:8.1f} ms")
+
+    total_ms = import_ms + timings["ready"] * 1000
+    verdict = "within" if total_ms <= args.budget_ms else "OVER"
+    print(f"\nCold start {total_ms:.1f} ms ({verdict} the {args.budget_ms:.0f} ms budget)")
+    sys.exit(0 if total_ms <= args.budget_ms else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,449 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+import os
+
+
+# (owner_id, list_id, seq): events of that list with a sequence number above seq
+EventCursor = Tuple[str, str, int]
+
+
+class TravelListRepository(ABC):
+    """Every storage operation the API, the job queue and the event log need.
+
+    Documents go in and come out as plain dicts shaped like the Pydantic models
+    in server.py, without backend-specific fields such as Mongo's `_id`.
+    """
+
+    async def ensure_indexes(self):
+        pass
+
+    def close(self):
+        pass
+
+    # Categories
+    @abstractmethod
+    async def list_categories(self) -> List[dict]: ...
+
+    @abstractmethod
+    async def insert_categories(self, categories: List[dict]): ...
+
+    # Travel lists
+    @abstractmethod
+    async def list_travel_lists(self, owner_id: str, limit: int = 1000) -> List[dict]: ...
+
+    @abstractmethod
+    async def get_travel_list(self, owner_id: str, list_id: str) -> Optional[dict]: ...
+
+    @abstractmethod
+    async def insert_travel_list(self, travel_list: dict): ...
+
+    @abstractmethod
+    async def replace_travel_list(self, travel_list: dict):
+        """Insert or overwrite the list with the same (owner_id, id)."""
+
+    @abstractmethod
+    async def update_travel_list(self, owner_id: str, list_id: str, fields: dict) -> bool:
+        """Set top-level fields; False when the list does not exist."""
+
+    @abstractmethod
+    async def delete_travel_list(self, owner_id: str, list_id: str, where: Optional[dict] = None) -> bool:
+        """Delete the list if it also matches `where` (a missing field matches None)."""
+
+    @abstractmethod
+    async def count_travel_lists(self, owner_id: str) -> int: ...
+
+    @abstractmethod
+    async def list_travel_list_ids(self, owner_id: str, list_ids: Optional[List[str]] = None) -> List[str]: ...
+
+    @abstractmethod
+    def iter_travel_lists(self, owner_id: str, batch_size: int) -> AsyncIterator[List[dict]]:
+        """Yield the owner's lists in batches."""
+
+    @abstractmethod
+    async def find_stale_lists(self, before: datetime, owner_id: Optional[str] = None) -> List[dict]:
+        """{owner_id, id} of lists with updated_at older than `before`, of every owner when None."""
+
+    @abstractmethod
+    async def bulk_update_travel_lists(self, owner_id: str, list_ids: List[str], fields: dict,
+                                       item_fields: dict) -> int:
+        """Set `fields` on the lists and `item_fields` on all their items; returns lists modified."""
+
+    # Items embedded in a travel list. Every item write also sets the list's
+    # updated_at, which the archive job reads as the last touch.
+    @abstractmethod
+    async def push_item(self, owner_id: str, list_id: str, item: dict) -> bool: ...
+
+    @abstractmethod
+    async def update_item(self, owner_id: str, list_id: str, item_id: str, fields: dict) -> Optional[dict]:
+        """Set fields on one item and return it, or None when list or item is missing."""
+
+    @abstractmethod
+    async def pull_item(self, owner_id: str, list_id: str, item_id: str) -> bool:
+        """Remove an item; False only when the list does not exist."""
+
+    # Item event log
+    @abstractmethod
+    async def next_event_seq(self, owner_id: str, list_id: str, now: datetime) -> Optional[int]:
+        """Allocate the list's next event sequence number and bump updated_at."""
+
+    @abstractmethod
+    async def set_items_snapshot(self, owner_id: str, list_id: str, expected_seq: Optional[int],
+                                 items: List[dict], snapshot_seq: int) -> bool:
+        """Replace items if the list's snapshot_seq is still `expected_seq`."""
+
+    @abstractmethod
+    async def insert_event(self, event: dict): ...
+
+    @abstractmethod
+    async def find_events_after(self, cursors: List[EventCursor]) -> List[dict]:
+        """Events past each cursor, ordered by seq."""
+
+    @abstractmethod
+    async def get_list_item(self, owner_id: str, list_id: str, item_id: str) -> Optional[dict]:
+        """{snapshot_seq, item} with only that item of the snapshot (None if absent); None without the list."""
+
+    @abstractmethod
+    async def find_item_events_after(self, owner_id: str, list_id: str, item_id: str,
+                                     seq: int) -> List[dict]:
+        """One item's events past `seq`, ordered by seq."""
+
+    @abstractmethod
+    async def mark_events_folded(self, owner_id: str, list_id: str, up_to_seq: int): ...
+
+    @abstractmethod
+    async def event_history(self, owner_id: str, list_id: str, item_id: Optional[str],
+                            limit: int) -> List[dict]: ...
+
+    @abstractmethod
+    async def event_backlog(self, min_count: int, owner_id: Optional[str] = None) -> List[Tuple[str, str]]:
+        """(owner_id, list_id) of lists with more than `min_count` unfolded events."""
+
+    @abstractmethod
+    async def delete_folded_events(self, before: datetime, owner_id: Optional[str] = None) -> int: ...
+
+    # Archived lists
+    @abstractmethod
+    async def put_archived(self, record: dict): ...
+
+    @abstractmethod
+    async def get_archived(self, owner_id: str, list_id: str) -> Optional[dict]: ...
+
+    @abstractmethod
+    async def delete_archived(self, owner_id: str, list_id: str): ...
+
+    @abstractmethod
+    async def list_archived(self, owner_id: str) -> List[dict]:
+        """Archive records without their packed `data`."""
+
+    # Analytics
+    @abstractmethod
+    async def get_analytics(self, owner_id: str) -> Optional[dict]: ...
+
+    @abstractmethod
+    async def put_analytics(self, owner_id: str, summary: dict): ...
+
+    # Jobs
+    @abstractmethod
+    async def insert_job(self, job: dict): ...
+
+    @abstractmethod
+    async def get_job(self, job_id: str, owner_id: Optional[str] = None) -> Optional[dict]: ...
+
+    @abstractmethod
+    async def claim_job(self, names: List[str], now: datetime, fields: dict) -> Optional[dict]:
+        """Atomically take the oldest runnable job.
+
+        Runnable means queued with run_after <= now, or running with an expired
+        lease and attempts left. The claimed job gets `fields` set and
+        `attempts` incremented.
+        """
+
+    @abstractmethod
+    async def fail_abandoned_jobs(self, now: datetime, fields: dict) -> int:
+        """Set `fields` on running jobs whose lease expired with no attempts left."""
+
+    @abstractmethod
+    async def update_job(self, job_id: str, fields: dict, where: Optional[dict] = None,
+                         inc: Optional[dict] = None):
+        """Set fields (and increment `inc`) when the job also matches `where`."""
+
+
+class MongoRepository(TravelListRepository):
+    def __init__(self, mongo_url: str, db_name: str):
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        self.client = AsyncIOMotorClient(mongo_url)
+        self.db = self.client[db_name]
+
+    # Every travel list query is led by owner_id so it hits the (owner_id, id)
+    # indexes and, on a sharded cluster, a single shard (see README)
+    async def ensure_indexes(self):
+        db = self.db
+        await db.travel_lists.create_index([("owner_id", 1), ("id", 1)], unique=True)
+        await db.travel_lists.create_index([("owner_id", 1), ("updated_at", -1)])
+        await db.travel_lists.create_index("updated_at")
+        await db.travel_lists_archive.create_index([("owner_id", 1), ("id", 1)], unique=True)
+        await db.analytics.create_index("owner_id", unique=True)
+        await db.item_events.create_index([("owner_id", 1), ("list_id", 1), ("seq", 1)], unique=True)
+        await db.item_events.create_index([("owner_id", 1), ("list_id", 1), ("item_id", 1), ("seq", -1)])
+        await db.item_events.create_index([("folded", 1), ("created_at", 1)])
+        await db.jobs.create_index("id", unique=True)
+        await db.jobs.create_index([("status", 1), ("run_after", 1)])
+
+    def close(self):
+        self.client.close()
+
+    async def list_categories(self):
+        return await self.db.categories.find({}, {"_id": 0}).to_list(1000)
+
+    async def insert_categories(self, categories):
+        await self.db.categories.insert_many([dict(category) for category in categories])
+
+    async def list_travel_lists(self, owner_id, limit=1000):
+        return await self.db.travel_lists.find({"owner_id": owner_id}, {"_id": 0}).to_list(limit)
+
+    async def get_travel_list(self, owner_id, list_id):
+        return await self.db.travel_lists.find_one({"owner_id": owner_id, "id": list_id}, {"_id": 0})
+
+    async def insert_travel_list(self, travel_list):
+        await self.db.travel_lists.insert_one(dict(travel_list))
+
+    async def replace_travel_list(self, travel_list):
+        await self.db.travel_lists.replace_one(
+            {"owner_id": travel_list["owner_id"], "id": travel_list["id"]}, travel_list, upsert=True
+        )
+
+    async def update_travel_list(self, owner_id, list_id, fields):
+        result = await self.db.travel_lists.update_one(
+            {"owner_id": owner_id, "id": list_id}, {"$set": fields}
+        )
+        return result.matched_count > 0
+
+    async def delete_travel_list(self, owner_id, list_id, where=None):
+        result = await self.db.travel_lists.delete_one({"owner_id": owner_id, "id": list_id, **(where or {})})
+        return result.deleted_count > 0
+
+    async def count_travel_lists(self, owner_id):
+        return await self.db.travel_lists.count_documents({"owner_id": owner_id})
+
+    async def list_travel_list_ids(self, owner_id, list_ids=None):
+        query = {"owner_id": owner_id}
+        if list_ids is not None:
+            query["id"] = {"$in": list_ids}
+        return [doc["id"] async for doc in self.db.travel_lists.find(query, {"id": 1})]
+
+    async def iter_travel_lists(self, owner_id, batch_size):
+        cursor = self.db.travel_lists.find({"owner_id": owner_id}, {"_id": 0})
+        while batch := await cursor.to_list(batch_size):
+            yield batch
+
+    async def find_stale_lists(self, before, owner_id=None):
+        query = {"updated_at": {"$lt": before}}
+        if owner_id is not None:
+            query["owner_id"] = owner_id
+        cursor = self.db.travel_lists.find(query, {"_id": 0, "owner_id": 1, "id": 1})
+        return await cursor.to_list(None)
+
+    async def bulk_update_travel_lists(self, owner_id, list_ids, fields, item_fields):
+        update = dict(fields)
+        update.update({f"items.$[].{k}": v for k, v in item_fields.items()})
+        result = await self.db.travel_lists.update_many(
+            {"owner_id": owner_id, "id": {"$in": list_ids}}, {"$set": update}
+        )
+        return result.modified_count
+
+    async def push_item(self, owner_id, list_id, item):
+        result = await self.db.travel_lists.update_one(
+            {"owner_id": owner_id, "id": list_id},
+            {"$push": {"items": item}, "$set": {"updated_at": datetime.utcnow()}}
+        )
+        return result.matched_count > 0
+
+    async def update_item(self, owner_id, list_id, item_id, fields):
+        from pymongo import ReturnDocument
+
+        travel_list = await self.db.travel_lists.find_one_and_update(
+            {"owner_id": owner_id, "id": list_id, "items.id": item_id},
+            {"$set": {**{f"items.$.{k}": v for k, v in fields.items()}, "updated_at": datetime.utcnow()}},
+            projection={"_id": 0, "items": {"$elemMatch": {"id": item_id}}},
+            return_document=ReturnDocument.AFTER,
+        )
+        return travel_list["items"][0] if travel_list else None
+
+    async def pull_item(self, owner_id, list_id, item_id):
+        result = await self.db.travel_lists.update_one(
+            {"owner_id": owner_id, "id": list_id},
+            {"$pull": {"items": {"id": item_id}}, "$set": {"updated_at": datetime.utcnow()}}
+        )
+        return result.matched_count > 0
+
+    async def next_event_seq(self, owner_id, list_id, now):
+        from pymongo import ReturnDocument
+
+        travel_list = await self.db.travel_lists.find_one_and_update(
+            {"owner_id": owner_id, "id": list_id},
+            {"$inc": {"event_seq": 1}, "$set": {"updated_at": now}},
+            projection={"event_seq": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        return travel_list["event_seq"] if travel_list else None
+
+    async def set_items_snapshot(self, owner_id, list_id, expected_seq, items, snapshot_seq):
+        result = await self.db.travel_lists.update_one(
+            {"owner_id": owner_id, "id": list_id, "snapshot_seq": expected_seq},
+            {"$set": {"items": items, "snapshot_seq": snapshot_seq}}
+        )
+        return result.modified_count > 0
+
+    async def insert_event(self, event):
+        await self.db.item_events.insert_one(dict(event))
+
+    async def find_events_after(self, cursors):
+        if not cursors:
+            return []
+        clauses = [{"owner_id": owner_id, "list_id": list_id, "seq": {"$gt": seq}}
+                   for owner_id, list_id, seq in cursors]
+        return await self.db.item_events.find({"$or": clauses}, {"_id": 0}).sort("seq", 1).to_list(None)
+
+    async def get_list_item(self, owner_id, list_id, item_id):
+        travel_list = await self.db.travel_lists.find_one(
+            {"owner_id": owner_id, "id": list_id},
+            {"_id": 0, "snapshot_seq": 1, "items": {"$elemMatch": {"id": item_id}}},
+        )
+        if not travel_list:
+            return None
+        items = travel_list.get("items") or [None]
+        return {"snapshot_seq": travel_list.get("snapshot_seq"), "item": items[0]}
+
+    async def find_item_events_after(self, owner_id, list_id, item_id, seq):
+        cursor = self.db.item_events.find(
+            {"owner_id": owner_id, "list_id": list_id, "item_id": item_id, "seq": {"$gt": seq}}, {"_id": 0}
+        )
+        return await cursor.sort("seq", 1).to_list(None)
+
+    async def mark_events_folded(self, owner_id, list_id, up_to_seq):
+        await self.db.item_events.update_many(
+            {"owner_id": owner_id, "list_id": list_id, "seq": {"$lte": up_to_seq}, "folded": False},
+            {"$set": {"folded": True}}
+        )
+
+    async def event_history(self, owner_id, list_id, item_id, limit):
+        query = {"owner_id": owner_id, "list_id": list_id}
+        if item_id:
+            query["item_id"] = item_id
+        cursor = self.db.item_events.find(query, {"_id": 0, "folded": 0}).sort("seq", -1).limit(limit)
+        return await cursor.to_list(limit)
+
+    async def event_backlog(self, min_count, owner_id=None):
+        match = {"folded": False}
+        if owner_id is not None:
+            match["owner_id"] = owner_id
+        backlog = self.db.item_events.aggregate([
+            {"$match": match},
+            {"$group": {"_id": {"owner_id": "$owner_id", "list_id": "$list_id"}, "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gt": min_count}}},
+        ])
+        return [(entry["_id"]["owner_id"], entry["_id"]["list_id"]) async for entry in backlog]
+
+    async def delete_folded_events(self, before, owner_id=None):
+        query = {"folded": True, "created_at": {"$lt": before}}
+        if owner_id is not None:
+            query["owner_id"] = owner_id
+        result = await self.db.item_events.delete_many(query)
+        return result.deleted_count
+
+    async def put_archived(self, record):
+        await self.db.travel_lists_archive.replace_one(
+            {"owner_id": record["owner_id"], "id": record["id"]}, record, upsert=True
+        )
+
+    async def get_archived(self, owner_id, list_id):
+        return await self.db.travel_lists_archive.find_one({"owner_id": owner_id, "id": list_id}, {"_id": 0})
+
+    async def delete_archived(self, owner_id, list_id):
+        await self.db.travel_lists_archive.delete_one({"owner_id": owner_id, "id": list_id})
+
+    async def list_archived(self, owner_id):
+        cursor = self.db.travel_lists_archive.find({"owner_id": owner_id}, {"data": 0, "_id": 0})
+        return await cursor.to_list(None)
+
+    async def get_analytics(self, owner_id):
+        return await self.db.analytics.find_one({"owner_id": owner_id}, {"_id": 0})
+
+    async def put_analytics(self, owner_id, summary):
+        await self.db.analytics.replace_one({"owner_id": owner_id}, {"owner_id": owner_id, **summary}, upsert=True)
+
+    async def insert_job(self, job):
+        await self.db.jobs.insert_one(dict(job))
+
+    async def get_job(self, job_id, owner_id=None):
+        query = {"id": job_id}
+        if owner_id is not None:
+            query["owner_id"] = owner_id
+        return await self.db.jobs.find_one(query, {"_id": 0})
+
+    async def claim_job(self, names, now, fields):
+        query = {
+            "name": {"$in": names},
+            "$or": [
+                {"status": "queued", "run_after": {"$lte": now}},
+                {"status": "running", "lease_expires_at": {"$lt": now},
+                 "$expr": {"$lt": ["$attempts", "$max_attempts"]}},
+            ],
+        }
+        from pymongo import ReturnDocument
+
+        return await self.db.jobs.find_one_and_update(
+            query,
+            {"$set": fields, "$inc": {"attempts": 1}},
+            projection={"_id": 0},
+            sort=[("run_after", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def fail_abandoned_jobs(self, now, fields):
+        result = await self.db.jobs.update_many(
+            {"status": "running", "lease_expires_at": {"$lt": now},
+             "$expr": {"$gte": ["$attempts", "$max_attempts"]}},
+            {"$set": fields},
+        )
+        return result.modified_count
+
+    async def update_job(self, job_id, fields, where=None, inc=None):
+        update = {"$set": fields}
+        if inc:
+            update["$inc"] = inc
+        await self.db.jobs.update_one({"id": job_id, **(where or {})}, update)
+
+
+class LazyRepository:
+    # Builds the real repository on first use, keeping driver imports and
+    # client construction out of module import
+    def __init__(self, factory: Callable[[], TravelListRepository]):
+        self._factory = factory
+        self._repo: Optional[TravelListRepository] = None
+
+    def resolve(self) -> TravelListRepository:
+        if self._repo is None:
+            self._repo = self._factory()
+        return self._repo
+
+    def __getattr__(self, name):
+        return getattr(self.resolve(), name)
+
+    def close(self):
+        if self._repo is not None:
+            self._repo.close()
+
+
+def repository_from_env() -> TravelListRepository:
+    # STORAGE_BACKEND=embedded runs without a MongoDB server (see embedded_storage.py)
+    backend = os.environ.get('STORAGE_BACKEND', 'mongo')
+    if backend == 'embedded':
+        from embedded_storage import EmbeddedRepository
+
+        return EmbeddedRepository(os.environ.get('EMBEDDED_SQLITE_PATH') or None)
+    if backend != 'mongo':
+        raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+    return MongoRepository(os.environ['MONGO_URL'], os.environ['DB_NAME'])
@@ -2,20 +2,30 @@
 """
 Comprehensive Backend API Tests for Travel Packing List Application
 Tests all endpoints with Arabic text support and realistic travel data
+
+Run with --in-process to test backend/server.py directly on the embedded
+storage engine, without a deployment or a MongoDB server.
 """
 
 import requests
 import json
+import logging
+import os
 import sys
+import time
+import uuid
 from datetime import datetime
+from pathlib import Path
 
 # Backend URL from frontend/.env
 BASE_URL = "https://2c183e2e-3cc7-43c2-85b3-0c4f74d74da2.preview.emergentagent.com/api"
 
 class TravelPackingListTester:
-    def __init__(self):
-        self.base_url = BASE_URL
-        self.session = requests.Session()
+    def __init__(self, base_url=BASE_URL, session=None, job_queue=None):
+        self.base_url = base_url
+        self.session = session or requests.Session()
+        # The app's JobQueue when testing in-process, for the retry test
+        self.job_queue = job_queue
         self.session.headers.update({
             'Content-Type': 'application/json',
             'Accept': 'application/json'
@@ -23,6 +33,9 @@ class TravelPackingListTester:
         self.test_results = []
         self.created_list_id = None
         self.created_item_id = None
+        self.archived_list_id = None
+        self.archived_item_count = 0
+        self.imported_list_ids = []
         
     def log_test(self, test_name, success, message, response_data=None):
         """Log test results"""
@@ -439,6 +452,398 @@ class TravelPackingListTester:
             self.log_test("Verify Item Deleted", False, f"Exception: {str(e)}")
             return False
     
+    def create_list(self, name, headers=None):
+        """Create a travel list for the tests below and return it"""
+        response = self.session.post(
+            f"{self.base_url}/travel-lists",
+            json={"name": name, "destination": "عمّان"},  # Amman
+            headers=headers
+        )
+        response.raise_for_status()
+        return response.json()
+    
+    def test_archive_list(self):
+        """Test POST /api/travel-lists/{list_id}/archive and GET /api/archive"""
+        try:
+            travel_list = self.create_list("رحلة قديمة")  # Old trip
+            self.archived_list_id = travel_list['id']
+            self.archived_item_count = len(travel_list['items'])
+            
+            response = self.session.post(f"{self.base_url}/travel-lists/{self.archived_list_id}/archive")
+            if response.status_code != 200:
+                self.log_test("Archive List", False, 
+                            f"HTTP {response.status_code}: {response.text}")
+                return False
+            
+            active_ids = [tl['id'] for tl in self.session.get(f"{self.base_url}/travel-lists").json()]
+            archived = self.session.get(f"{self.base_url}/archive").json()
+            summary = next((record for record in archived if record['id'] == self.archived_list_id), None)
+            
+            if self.archived_list_id in active_ids:
+                self.log_test("Archive List", False, "Archived list is still in the active lists")
+                return False
+            if not summary or summary.get('name') != "رحلة قديمة":
+                self.log_test("Archive List", False, "Archived list missing from GET /archive")
+                return False
+            
+            self.log_test("Archive List", True, 
+                        f"Archived list moved out of the active lists ({len(archived)} archived)")
+            return True
+                
+        except Exception as e:
+            self.log_test("Archive List", False, f"Exception: {str(e)}")
+            return False
+    
+    def test_rehydrate_archived_list(self):
+        """Verify GET /api/travel-lists/{list_id} restores an archived list transparently"""
+        if not self.archived_list_id:
+            self.log_test("Rehydrate Archived List", False, 
+                        "No archived list ID available from previous test")
+            return False
+            
+        try:
+            response = self.session.get(f"{self.base_url}/travel-lists/{self.archived_list_id}")
+            if response.status_code != 200:
+                self.log_test("Rehydrate Archived List", False, 
+                            f"HTTP {response.status_code}: {response.text}")
+                return False
+            
+            travel_list = response.json()
+            archived_ids = [record['id'] for record in self.session.get(f"{self.base_url}/archive").json()]
+            active_ids = [tl['id'] for tl in self.session.get(f"{self.base_url}/travel-lists").json()]
+            
+            if len(travel_list.get('items', [])) != self.archived_item_count:
+                self.log_test("Rehydrate Archived List", False, 
+                            f"Expected {self.archived_item_count} items, got {len(travel_list.get('items', []))}")
+                return False
+            if self.archived_list_id in archived_ids or self.archived_list_id not in active_ids:
+                self.log_test("Rehydrate Archived List", False, 
+                            "Rehydrated list was not moved back to the active lists")
+                return False
+            
+            self.log_test("Rehydrate Archived List", True, 
+                        f"Archived list restored on read with {self.archived_item_count} items")
+            return True
+                
+        except Exception as e:
+            self.log_test("Rehydrate Archived List", False, f"Exception: {str(e)}")
+            return False
+    
+    def test_unarchive_list(self):
+        """Test POST /api/travel-lists/{list_id}/unarchive"""
+        if not self.archived_list_id:
+            self.log_test("Unarchive List", False, 
+                        "No archived list ID available from previous test")
+            return False
+            
+        try:
+            # The list is active again, so there is nothing to unarchive
+            response = self.session.post(f"{self.base_url}/travel-lists/{self.archived_list_id}/unarchive")
+            if response.status_code != 404:
+                self.log_test("Unarchive List", False, 
+                            f"Expected 404 for an active list, got HTTP {response.status_code}")
+                return False
+            
+            self.session.post(f"{self.base_url}/travel-lists/{self.archived_list_id}/archive").raise_for_status()
+            response = self.session.post(f"{self.base_url}/travel-lists/{self.archived_list_id}/unarchive")
+            
+            if response.status_code == 200 and response.json().get('id') == self.archived_list_id:
+                self.log_test("Unarchive List", True, "Archived list restored explicitly")
+                return True
+            else:
+                self.log_test("Unarchive List", False, 
+                            f"HTTP {response.status_code}: {response.text}")
+                return False
+                
+        except Exception as e:
+            self.log_test("Unarchive List", False, f"Exception: {str(e)}")
+            return False
+    
+    def wait_for_job(self, job_id, headers=None, timeout=30):
+        """Poll GET /api/jobs/{job_id} until the job succeeds or fails"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            response = self.session.get(f"{self.base_url}/jobs/{job_id}", headers=headers)
+            response.raise_for_status()
+            job = response.json()
+            if job['status'] in ('succeeded', 'failed'):
+                return job
+            time.sleep(0.1)
+        raise TimeoutError(f"Job {job_id} did not finish in {timeout}s")
+    
+    def test_bulk_import_job(self):
+        """Test POST /api/jobs/bulk-import and job progress"""
+        try:
+            batch = uuid.uuid4().hex[:8]
+            lists = [
+                {"name": f"رحلة إلى القاهرة {batch}", "destination": "القاهرة"},  # Trip to Cairo
+                {"name": f"رحلة إلى مسقط {batch}", "destination": "مسقط",  # Trip to Muscat
+                 "items": [{"name": "Sunscreen", "name_ar": "واقي الشمس", "category": "health"}]},
+            ]
+            response = self.session.post(f"{self.base_url}/jobs/bulk-import", json={"lists": lists})
+            if response.status_code != 202:
+                self.log_test("Bulk Import Job", False, 
+                            f"HTTP {response.status_code}: {response.text}")
+                return False
+            
+            job = self.wait_for_job(response.json()['id'])
+            if job['status'] != 'succeeded' or job['result'] != {"imported": 2}:
+                self.log_test("Bulk Import Job", False, 
+                            f"Job ended {job['status']}: {job['result'] or job['error']}")
+                return False
+            if job['progress'] != {"done": 2, "total": 2}:
+                self.log_test("Bulk Import Job", False, f"Unexpected progress {job['progress']}")
+                return False
+            
+            imported = [tl for tl in self.session.get(f"{self.base_url}/travel-lists").json()
+                        if tl['name'].endswith(batch)]
+            self.imported_list_ids = [tl['id'] for tl in imported]
+            custom = next((tl for tl in imported if tl['destination'] == "مسقط"), None)
+            if len(imported) != 2 or not custom or len(custom['items']) != 1:
+                self.log_test("Bulk Import Job", False, "Imported lists missing or items not as given")
+                return False
+            
+            self.log_test("Bulk Import Job", True, 
+                        f"Imported {len(imported)} lists in {job['attempts']} attempt(s)")
+            return True
+                
+        except Exception as e:
+            self.log_test("Bulk Import Job", False, f"Exception: {str(e)}")
+            return False
+    
+    def test_bulk_update_job(self):
+        """Test POST /api/jobs/bulk-update on the imported lists"""
+        if not self.imported_list_ids:
+            self.log_test("Bulk Update Job", False, 
+                        "No imported list IDs available from previous test")
+            return False
+            
+        try:
+            bulk_update = {
+                "list_ids": self.imported_list_ids,
+                # Only name and destination may be set; the dotted path is ignored
+                "updates": {"destination": "الدوحة", "items.0.name": None},  # Doha
+                "item_updates": {"is_packed": True}
+            }
+            response = self.session.post(f"{self.base_url}/jobs/bulk-update", json=bulk_update)
+            if response.status_code != 202:
+                self.log_test("Bulk Update Job", False, 
+                            f"HTTP {response.status_code}: {response.text}")
+                return False
+            
+            job = self.wait_for_job(response.json()['id'])
+            if job['status'] != 'succeeded' or job['result'].get('modified') != len(self.imported_list_ids):
+                self.log_test("Bulk Update Job", False, 
+                            f"Job ended {job['status']}: {job['result'] or job['error']}")
+                return False
+            
+            for list_id in self.imported_list_ids:
+                response = self.session.get(f"{self.base_url}/travel-lists/{list_id}")
+                travel_list = response.json()
+                if (response.status_code != 200 or travel_list['destination'] != "الدوحة" or
+                        not all(item['is_packed'] for item in travel_list['items'])):
+                    self.log_test("Bulk Update Job", False, f"List {list_id} was not updated")
+                    return False
+            
+            self.log_test("Bulk Update Job", True, 
+                        f"Updated {job['result']['modified']} lists and packed all their items")
+            return True
+                
+        except Exception as e:
+            self.log_test("Bulk Update Job", False, f"Exception: {str(e)}")
+            return False
+    
+    def test_analytics_refresh_job(self):
+        """Test POST /api/jobs/analytics-refresh and GET /api/analytics"""
+        try:
+            travel_lists = self.session.get(f"{self.base_url}/travel-lists").json()
+            response = self.session.post(f"{self.base_url}/jobs/analytics-refresh")
+            if response.status_code != 202:
+                self.log_test("Analytics Refresh Job", False, 
+                            f"HTTP {response.status_code}: {response.text}")
+                return False
+            
+            job = self.wait_for_job(response.json()['id'])
+            summary = self.session.get(f"{self.base_url}/analytics").json()
+            expected_items = sum(len(tl['items']) for tl in travel_lists)
+            
+            if job['status'] != 'succeeded':
+                self.log_test("Analytics Refresh Job", False, 
+                            f"Job ended {job['status']}: {job['error']}")
+                return False
+            if summary.get('total_lists') != len(travel_lists) or summary.get('total_items') != expected_items:
+                self.log_test("Analytics Refresh Job", False, 
+                            f"Summary {summary.get('total_lists')} lists / {summary.get('total_items')} items, "
+                            f"expected {len(travel_lists)} / {expected_items}")
+                return False
+            
+            self.log_test("Analytics Refresh Job", True, 
+                        f"Summary covers {summary['total_lists']} lists and {summary['total_items']} items")
+            return True
+                
+        except Exception as e:
+            self.log_test("Analytics Refresh Job", False, f"Exception: {str(e)}")
+            return False
+    
+    def test_job_retry_backoff(self):
+        """Verify failing jobs are retried with exponential backoff (in-process only)"""
+        queue = self.job_queue
+        attempt_times = {}
+        
+        async def flaky_job(job, succeed_on):
+            attempt_times.setdefault(job.id, []).append(time.monotonic())
+            if job.job['attempts'] < succeed_on:
+                raise RuntimeError("simulated failure")
+            return {"attempts": job.job['attempts']}
+        
+        saved = queue.backoff_seconds, queue.poll_interval
+        queue.backoff_seconds, queue.poll_interval = 0.2, 0.05
+        queue.register("test_flaky", flaky_job)
+        # The simulated failures would log a traceback each
+        logging.getLogger("jobs").disabled = True
+        owner = {"X-Owner-Id": f"retry-{uuid.uuid4().hex[:8]}"}
+        try:
+            recovered = self.session.portal.call(
+                queue.enqueue, "test_flaky", {"succeed_on": 3}, owner["X-Owner-Id"])
+            exhausted = self.session.portal.call(
+                queue.enqueue, "test_flaky", {"succeed_on": 99}, owner["X-Owner-Id"])
+            recovered = self.wait_for_job(recovered['id'], headers=owner)
+            exhausted = self.wait_for_job(exhausted['id'], headers=owner)
+            
+            if recovered['status'] != 'succeeded' or recovered['attempts'] != 3 or recovered['error']:
+                self.log_test("Job Retry Backoff", False, 
+                            f"Flaky job ended {recovered['status']} after {recovered['attempts']} attempts")
+                return False
+            if exhausted['status'] != 'failed' or exhausted['attempts'] != exhausted['max_attempts'] or \
+                    "simulated failure" not in (exhausted['error'] or ""):
+                self.log_test("Job Retry Backoff", False, 
+                            f"Failing job ended {exhausted['status']} after {exhausted['attempts']} attempts")
+                return False
+            
+            # Retries wait backoff_seconds, then twice that
+            times = attempt_times[recovered['id']]
+            gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+            if gaps[0] < 0.2 * 0.9 or gaps[1] < 0.4 * 0.9:
+                self.log_test("Job Retry Backoff", False, 
+                            f"Retries did not back off: gaps {[round(gap, 2) for gap in gaps]}s")
+                return False
+            
+            self.log_test("Job Retry Backoff", True, 
+                        f"Retried after {gaps[0]:.2f}s and {gaps[1]:.2f}s; gave up after {exhausted['attempts']} attempts")
+            return True
+                
+        except Exception as e:
+            self.log_test("Job Retry Backoff", False, f"Exception: {str(e)}")
+            return False
+        finally:
+            queue.backoff_seconds, queue.poll_interval = saved
+            queue.handlers.pop("test_flaky", None)
+            logging.getLogger("jobs").disabled = False
+    
+    def test_owner_isolation(self):
+        """Verify lists, archive runs and jobs are scoped by X-Owner-Id"""
+        try:
+            suffix = uuid.uuid4().hex[:8]
+            alice = {"X-Owner-Id": f"alice-{suffix}"}
+            bob = {"X-Owner-Id": f"bob-{suffix}"}
+            alice_list = self.create_list("قائمة أليس", headers=alice)  # Alice's list
+            bob_list = self.create_list("قائمة بوب", headers=bob)  # Bob's list
+            
+            response = self.session.get(f"{self.base_url}/travel-lists/{alice_list['id']}", headers=bob)
+            bob_ids = [tl['id'] for tl in self.session.get(f"{self.base_url}/travel-lists", headers=bob).json()]
+            if response.status_code != 404 or alice_list['id'] in bob_ids or bob_list['id'] not in bob_ids:
+                self.log_test("Owner Isolation", False, "Another owner's list is visible")
+                return False
+            
+            # Bob archives everything he owns; Alice's list must stay active
+            response = self.session.post(f"{self.base_url}/archive/run",
+                                         json={"before": "2100-01-01T00:00:00"}, headers=bob)
+            job = self.wait_for_job(response.json()['id'], headers=bob)
+            alice_ids = [tl['id'] for tl in self.session.get(f"{self.base_url}/travel-lists", headers=alice).json()]
+            alice_archive = self.session.get(f"{self.base_url}/archive", headers=alice).json()
+            if job['result'] != {"archived": 1} or alice_list['id'] not in alice_ids or alice_archive:
+                self.log_test("Owner Isolation", False, 
+                            f"Archive run crossed owners: {job['result']}, {len(alice_archive)} archived for Alice")
+                return False
+            
+            response = self.session.get(f"{self.base_url}/jobs/{job['id']}", headers=alice)
+            if response.status_code != 404:
+                self.log_test("Owner Isolation", False, "Another owner's job is visible")
+                return False
+            
+            self.log_test("Owner Isolation", True, 
+                        "Lists, archive runs and jobs stay within their owner")
+            return True
+                
+        except Exception as e:
+            self.log_test("Owner Isolation", False, f"Exception: {str(e)}")
+            return False
+    
+    def test_item_event_log(self):
+        """Test undo, history and folding of the item event log (ITEM_EVENT_LOG)"""
+        try:
+            travel_list = self.create_list("رحلة إلى بيروت")  # Trip to Beirut
+            list_url = f"{self.base_url}/travel-lists/{travel_list['id']}"
+            response = self.session.get(f"{list_url}/history")
+            if response.status_code == 404 and response.json().get('detail') == "Item history is not enabled":
+                self.log_test("Item Event Log", True, "Skipped: the item event log is not enabled")
+                return True
+            
+            item = self.session.post(f"{list_url}/items", json={
+                "name": "Camera", "name_ar": "كاميرا", "category": "electronics"
+            }).json()
+            item_url = f"{list_url}/items/{item['id']}"
+            
+            def is_packed():
+                items = self.session.get(list_url).json()['items']
+                current = next((i for i in items if i['id'] == item['id']), None)
+                return current['is_packed'] if current else None
+            
+            # More toggles than EVENT_SNAPSHOT_EVERY, so reads fold them into the snapshot
+            for toggle in range(55):
+                self.session.put(item_url, json={"is_packed": toggle % 2 == 0}).raise_for_status()
+            checks = [("after 55 toggles", is_packed(), True)]
+            
+            undone = self.session.post(f"{list_url}/undo").json()
+            checks.append(("after undo", is_packed(), False))
+            self.session.post(f"{list_url}/undo").raise_for_status()
+            checks.append(("after second undo", is_packed(), True))
+            
+            history = self.session.get(f"{list_url}/history", params={"item_id": item['id']}).json()
+            if undone.get('type') != 'update' or [event['type'] for event in history[:2]] != ['undo', 'undo']:
+                self.log_test("Item Event Log", False, "Undo or history did not record the changes")
+                return False
+            response = self.session.get(f"{self.base_url}/travel-lists/{uuid.uuid4()}/history")
+            if response.status_code != 404:
+                self.log_test("Item Event Log", False, 
+                            f"History of an unknown list returned HTTP {response.status_code}")
+                return False
+            
+            # Compaction folds all but the newest events; undo keeps working past it
+            job = self.wait_for_job(self.session.post(f"{self.base_url}/jobs/compact-events").json()['id'])
+            checks.append(("after compaction", is_packed(), True))
+            self.session.post(f"{list_url}/undo").raise_for_status()
+            checks.append(("after undo past compaction", is_packed(), False))
+            
+            self.session.delete(item_url).raise_for_status()
+            checks.append(("after delete", is_packed(), None))
+            self.session.post(f"{list_url}/undo").raise_for_status()
+            checks.append(("after undoing the delete", is_packed(), False))
+            
+            wrong = [f"{label}: {actual} != {expected}" for label, actual, expected in checks if actual != expected]
+            if job['status'] != 'succeeded' or wrong:
+                self.log_test("Item Event Log", False, 
+                            f"Compaction {job['status']}; " + "; ".join(wrong))
+                return False
+            
+            self.log_test("Item Event Log", True, 
+                        f"{len(history)} events recorded; undo and folding kept the item state correct")
+            return True
+                
+        except Exception as e:
+            self.log_test("Item Event Log", False, f"Exception: {str(e)}")
+            return False
+    
     def run_all_tests(self):
         """Run all backend API tests in sequence"""
         print(f"🚀 Starting Travel Packing List Backend API Tests")
@@ -456,8 +861,18 @@ class TravelPackingListTester:
             self.test_update_item,
             self.test_verify_stats_after_update,
             self.test_delete_item,
-            self.test_verify_item_deleted
+            self.test_verify_item_deleted,
+            self.test_archive_list,
+            self.test_rehydrate_archived_list,
+            self.test_unarchive_list,
+            self.test_bulk_import_job,
+            self.test_bulk_update_job,
+            self.test_analytics_refresh_job,
+            self.test_owner_isolation,
+            self.test_item_event_log
         ]
+        if self.job_queue is not None:
+            tests.append(self.test_job_retry_backoff)
         
         passed = 0
         failed = 0
@@ -483,10 +898,33 @@ class TravelPackingListTester:
         
         return failed == 0
 
+def run_in_process():
+    """Run the tests against the app in this process on the embedded engine,
+    once storing items directly and once with the item event log"""
+    os.environ.setdefault('STORAGE_BACKEND', 'embedded')
+    sys.path.insert(0, str(Path(__file__).parent / 'backend'))
+    from fastapi.testclient import TestClient
+    import server
+
+    success = True
+    with TestClient(server.app) as client:
+        for item_event_log in (False, True):
+            # Routes read the flag per request; lists from the first pass are
+            # still valid in event log mode
+            server.ITEM_EVENT_LOG = item_event_log
+            print(f"ITEM_EVENT_LOG={str(item_event_log).lower()}")
+            tester = TravelPackingListTester("http://testserver/api", client, server.job_queue)
+            success = tester.run_all_tests() and success
+            print()
+    return success
+
 def main():
     """Main test execution"""
-    tester = TravelPackingListTester()
-    success = tester.run_all_tests()
+    if '--in-process' in sys.argv:
+        success = run_in_process()
+    else:
+        tester = TravelPackingListTester()
+        success = tester.run_all_tests()
     
     # Exit with appropriate code
     sys.exit(0 if success else 1)